@@ -0,0 +1,151 @@
+import math
+import threading
+import time
+from flask import g, jsonify, request
+
+class Overloaded(Exception):
+    """A request was turned away; carries the status and Retry-After seconds."""
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class ClassGate:
+    """Bounded concurrency with a bounded wait queue for one route class.
+
+    Up to `concurrency` requests run at once and up to `queue_depth` more
+    wait, each for at most `queue_timeout` seconds. Anything beyond that is
+    rejected at once instead of adding to the wait.
+    """
+
+    def __init__(self, name, concurrency, queue_depth, queue_timeout):
+        self.name = name
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._queue_depth = queue_depth
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self):
+        if self._slots.acquire(blocking=False):
+            return self._admit()
+        with self._lock:
+            if self._waiting >= self._queue_depth:
+                self.rejected += 1
+                raise Overloaded(f'Too many {self.name} requests queued', 503, 1)
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f'Timed out waiting for a {self.name} request slot', 503, 1)
+        return self._admit()
+
+    def _admit(self):
+        with self._lock:
+            self.admitted += 1
+        released = []
+
+        def release():
+            # Called from both the response and the request teardown
+            if not released:
+                released.append(True)
+                self._slots.release()
+        return release
+
+    def metrics(self):
+        with self._lock:
+            return {'admitted': self.admitted, 'rejected': self.rejected, 'waiting': self._waiting}
+
+class TokenBuckets:
+    """Per-client token buckets: `rate` requests per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def take(self, client):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[client] = (tokens, now)
+                self.limited += 1
+                raise Overloaded('Rate limit exceeded', 429, math.ceil((1 - tokens) / self.rate))
+            self._buckets[client] = (tokens - 1, now)
+            # Full buckets carry no state, so idle clients do not accumulate
+            if len(self._buckets) > 10000:
+                self._buckets = {key: value for key, value in self._buckets.items()
+                                 if value[0] + (now - value[1]) * self.rate < self.burst}
+
+class AdmissionController:
+    """Admission control for a Flask app.
+
+    Endpoints listed as heavy share one ClassGate and all others another, so
+    a pile-up of expensive reads cannot take the slots cheap calls need.
+    With a positive `rate`, each client (X-Client-Id header, else remote
+    address) is also limited by a token bucket. Turned-away requests get
+    429 (rate limit) or 503 (overloaded) with a Retry-After header.
+    """
+
+    def __init__(self, heavy_endpoints, heavy, light, rate, burst):
+        self.heavy_endpoints = set(heavy_endpoints)
+        self.gates = {
+            'heavy': ClassGate('heavy', **heavy),
+            'light': ClassGate('light', **light)
+        }
+        self.buckets = TokenBuckets(rate, burst) if rate > 0 else None
+        self.enabled = True
+
+    def install(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        return self
+
+    def route_class(self, endpoint):
+        return 'heavy' if endpoint in self.heavy_endpoints else 'light'
+
+    def _before(self):
+        if not self.enabled:
+            return None
+        try:
+            if self.buckets:
+                self.buckets.take(request.headers.get('X-Client-Id') or request.remote_addr)
+            g.admission_release = self.gates[self.route_class(request.endpoint)].acquire()
+        except Overloaded as e:
+            response = jsonify({'error': e.message})
+            response.status_code = e.status_code
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        return None
+
+    def _after(self, response):
+        release = g.pop('admission_release', None)
+        if release:
+            # Streamed bodies are produced after the request ends, so the
+            # slot is held until the response is closed
+            response.call_on_close(release)
+        return response
+
+    def _teardown(self, error):
+        release = g.pop('admission_release', None)
+        if release:
+            release()
+
+    def metrics(self):
+        metrics = {name: gate.metrics() for name, gate in self.gates.items()}
+        if self.buckets:
+            metrics['rate_limited'] = self.buckets.limited
+        return metrics
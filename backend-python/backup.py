@@ -0,0 +1,274 @@
+"""Online, incremental backups of the SQLite database or the CSV data files.
+
+Every backup is a snapshot: a JSON manifest listing, for each file, the
+SHA-256 of its fixed-size chunks. Chunks are stored once under
+`objects/`, so a snapshot only adds the chunks that changed since earlier
+ones, yet any snapshot can be restored on its own. Snapshots beyond the
+retention count are deleted along with chunks no snapshot uses anymore.
+
+    python backup.py create
+    python backup.py list
+    python backup.py restore <snapshot> <target-dir>
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: backups only exclude each other within a process
+    fcntl = None
+
+from config import Config
+import csv_store
+
+CHUNK_SIZE = 1024 * 1024
+
+# Serializes backups in this process; the repository's lock file does so
+# across processes (the scheduler and `backup.py create`)
+_backup_lock = threading.Lock()
+
+class BackupRestarted(Exception):
+    """The source database changed under a stepwise backup."""
+
+class BackupRepository:
+    """Snapshots and the chunk store they share, under one directory."""
+
+    def __init__(self, path, retention):
+        self.path = path
+        self.retention = retention
+        self.snapshots_dir = os.path.join(path, 'snapshots')
+        self.objects_dir = os.path.join(path, 'objects')
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def snapshots(self):
+        """Snapshot names, oldest first"""
+        return sorted(name[:-len('.json')] for name in os.listdir(self.snapshots_dir) if name.endswith('.json'))
+
+    def manifest(self, name):
+        with open(os.path.join(self.snapshots_dir, f'{name}.json')) as f:
+            return json.load(f)
+
+    def latest(self):
+        names = self.snapshots()
+        return self.manifest(names[-1]) if names else None
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the repository for a whole backup.
+
+        Pruning deletes every chunk no snapshot lists, including chunks a
+        concurrent backup has stored or reused but not yet committed, so
+        only one backup may run at a time.
+        """
+        with _backup_lock, open(os.path.join(self.path, 'lock'), 'a') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def store_chunks(self, f, size):
+        """Store the first `size` bytes of an open file; returns their chunk digests"""
+        digests = []
+        remaining = size
+        while remaining > 0:
+            data = f.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            digest = hashlib.sha256(data).hexdigest()
+            path = self._object_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(fd, 'wb') as out:
+                    out.write(data)
+                os.replace(tmp_path, path)
+            digests.append(digest)
+        return digests
+
+    def commit(self, files, kind):
+        """Record a snapshot of `files` (name -> {size, chunks, ...}) and apply retention.
+
+        Call within exclusive(), like the store_chunks() calls before it.
+        """
+        name = datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')
+        manifest = {'name': name, 'kind': kind, 'created_at': datetime.utcnow().isoformat(), 'files': files}
+        fd, tmp_path = tempfile.mkstemp(dir=self.snapshots_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.snapshots_dir, f'{name}.json'))
+        self._prune()
+        return manifest
+
+    def _prune(self):
+        names = self.snapshots()
+        for name in names[:max(0, len(names) - self.retention)]:
+            os.unlink(os.path.join(self.snapshots_dir, f'{name}.json'))
+        used = {
+            digest
+            for name in self.snapshots()
+            for entry in self.manifest(name)['files'].values()
+            for digest in entry['chunks']
+        }
+        for path in glob.glob(os.path.join(self.objects_dir, '*', '*')):
+            if os.path.basename(path) not in used:
+                os.unlink(path)
+
+    def restore(self, name, target_dir):
+        """Rebuild a snapshot's files under `target_dir`"""
+        os.makedirs(target_dir, exist_ok=True)
+        for file_name, entry in self.manifest(name)['files'].items():
+            with open(os.path.join(target_dir, file_name), 'wb') as out:
+                for digest in entry['chunks']:
+                    with open(self._object_path(digest), 'rb') as chunk:
+                        out.write(chunk.read())
+
+def backup_sqlite(repository, db_path, pages_per_step, step_sleep, max_restarts=3):
+    """Snapshot a SQLite database with the online backup API.
+
+    The database is copied `pages_per_step` pages at a time, releasing its
+    lock between steps so writers only wait for one step. A write from
+    another connection restarts the copy; after `max_restarts` restarts the
+    rest is copied in one step.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=repository.path, suffix='.db')
+    os.close(fd)
+    try:
+        source = sqlite3.connect(db_path)
+        try:
+            for attempt in range(max_restarts + 1):
+                pages = pages_per_step if attempt < max_restarts else -1
+                remaining = []
+
+                def progress(status, left, total):
+                    # Restarted copies report no progress
+                    if remaining and left >= remaining[-1]:
+                        raise BackupRestarted()
+                    remaining.append(left)
+
+                target = sqlite3.connect(tmp_path)
+                try:
+                    source.backup(target, pages=pages, progress=progress, sleep=step_sleep)
+                    break
+                except BackupRestarted:
+                    continue
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        with repository.exclusive():
+            with open(tmp_path, 'rb') as f:
+                chunks = repository.store_chunks(f, os.path.getsize(tmp_path))
+            files = {os.path.basename(db_path): {'size': os.path.getsize(tmp_path), 'chunks': chunks}}
+            return repository.commit(files, 'sqlite')
+    finally:
+        os.unlink(tmp_path)
+
+def backup_csv(repository, paths):
+    """Copy-on-write snapshot of CSV files.
+
+    Under csv_store.write_lock, each file is opened and its size recorded;
+    this takes microseconds. Appends only add bytes past that size and
+    rewrites replace the file with a new one, so reading the recorded size
+    from the open handle afterwards yields the file exactly as it was,
+    without holding up writers. Files unchanged since the previous snapshot
+    reuse its chunks without being read.
+    """
+    handles = {}
+    try:
+        with csv_store.write_lock:
+            for path in paths:
+                if os.path.exists(path):
+                    f = open(path, 'rb')
+                    handles[os.path.basename(path)] = (f, os.fstat(f.fileno()))
+        with repository.exclusive():
+            previous = (repository.latest() or {}).get('files', {})
+            files = {}
+            for name, (f, stat) in handles.items():
+                identity = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+                if previous.get(name, {}).get('identity') == identity:
+                    files[name] = previous[name]
+                else:
+                    files[name] = {'size': stat.st_size, 'identity': identity,
+                                   'chunks': repository.store_chunks(f, stat.st_size)}
+            return repository.commit(files, 'csv')
+    finally:
+        for f, _ in handles.values():
+            f.close()
+
+def csv_data_files():
+    """CSV files to back up, including per-year partitions"""
+    return [file for path in Config.CSV.values() for file in csv_store.data_files(path)]
+
+def repository():
+    return BackupRepository(Config.BACKUP['dir'], Config.BACKUP['retention'])
+
+def create_backup():
+    """Take one snapshot of the configured storage"""
+    if Config.STORAGE_TYPE == 'sqlite':
+        return backup_sqlite(repository(), Config.SQLITE['filename'],
+                             Config.BACKUP['pages_per_step'], Config.BACKUP['step_sleep_ms'] / 1000)
+    if Config.STORAGE_TYPE == 'csv':
+        return backup_csv(repository(), csv_data_files())
+    raise ValueError('PostgreSQL is backed up with pg_basebackup or pg_dump, not by the server')
+
+class BackupScheduler:
+    """Takes a snapshot every `interval` seconds on a background thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='backup-scheduler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            started = time.monotonic()
+            try:
+                manifest = create_backup()
+                print(f"Backup {manifest['name']} taken in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                print(f"Backup failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('create', help='take a snapshot now')
+    commands.add_parser('list', help='list snapshots')
+    restore = commands.add_parser('restore', help='restore a snapshot into a directory')
+    restore.add_argument('snapshot')
+    restore.add_argument('target_dir')
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        print(create_backup()['name'])
+    elif args.command == 'list':
+        repo = repository()
+        for name in repo.snapshots():
+            manifest = repo.manifest(name)
+            size = sum(entry['size'] for entry in manifest['files'].values())
+            print(f"{name}  {manifest['kind']:6}  {len(manifest['files'])} files  {size} bytes")
+    else:
+        repository().restore(args.snapshot, args.target_dir)
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,14 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
 
+def parse_hosts(value, default_port):
+    """Parse a comma-separated list of host[:port] into (host, port) pairs."""
+    hosts = []
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        host, _, port = item.partition(':')
+        hosts.append((host, int(port or default_port)))
+    return hosts
+
 class Config:
     # CSV Configuration
     CSV = {
@@ -19,13 +27,70 @@ class Config:
         'port': int(os.getenv('DB_PORT', 5432)),
         'database': os.getenv('DB_NAME', 'events_db'),
         'user': os.getenv('DB_USER', 'postgres'),
-        'password': os.getenv('DB_PASSWORD', 'postgres')
+        'password': os.getenv('DB_PASSWORD', 'postgres'),
+        # Read replicas, as host[:port], sharing the primary's database and credentials
+        'replicas': parse_hosts(os.getenv('DB_REPLICAS', ''), int(os.getenv('DB_PORT', 5432)))
     }
 
     # SQLite Configuration
     SQLITE = {
-        'filename': os.getenv('SQLITE_FILE', str(BASE_DIR / 'data' / 'events.db'))
+        'filename': os.getenv('SQLITE_FILE', str(BASE_DIR / 'data' / 'events.db')),
+        # Read-only replica files, comma-separated
+        'replicas': [path for path in os.getenv('SQLITE_REPLICAS', '').split(',') if path]
     }
 
     # Storage Type: 'csv', 'postgres', or 'sqlite'
-    STORAGE_TYPE = os.getenv('STORAGE_TYPE', 'csv') 
\ No newline at end of file
+    STORAGE_TYPE = os.getenv('STORAGE_TYPE', 'csv') 
+
+    # Group commit: batch concurrent inserts into one transaction or file append
+    GROUP_COMMIT = {
+        'enabled': os.getenv('GROUP_COMMIT', 'false').lower() == 'true',
+        'max_batch': int(os.getenv('GROUP_COMMIT_MAX_BATCH', 256)),
+        'max_delay_ms': float(os.getenv('GROUP_COMMIT_DELAY_MS', 5))
+    }
+
+    # Partition entries and events by year (postgres and csv); years before
+    # the last `hot_years` are read-only and compacted
+    PARTITIONING = {
+        'enabled': os.getenv('PARTITION_BY_YEAR', 'false').lower() == 'true',
+        'hot_years': int(os.getenv('PARTITION_HOT_YEARS', 2))
+    }
+
+    # Online backups (sqlite and csv); BACKUP_INTERVAL=0 disables scheduled backups
+    BACKUP = {
+        'dir': os.getenv('BACKUP_DIR', str(BASE_DIR / 'data' / 'backups')),
+        'interval_s': float(os.getenv('BACKUP_INTERVAL', 0)),
+        'retention': int(os.getenv('BACKUP_RETENTION', 7)),
+        'pages_per_step': int(os.getenv('BACKUP_PAGES_PER_STEP', 256)),
+        'step_sleep_ms': float(os.getenv('BACKUP_STEP_SLEEP_MS', 10))
+    }
+
+    # Cache of GET /entries, /events, /events/pivot and /dropdowns results,
+    # off unless RESULT_CACHE_MB is set. Only this process's writes
+    # invalidate it, so enable it only when no other process (another
+    # worker, seed.py, migrate.py, another server) writes the same data, or
+    # set RESULT_CACHE_TTL (seconds, 0 = none) to bound staleness. A replica
+    # may lag behind a write, so results read from DB_REPLICAS/SQLITE_REPLICAS
+    # are only cached with a positive TTL
+    RESULT_CACHE = {
+        'max_mb': float(os.getenv('RESULT_CACHE_MB', 0)),
+        'ttl_s': float(os.getenv('RESULT_CACHE_TTL', 0))
+    }
+
+    # Admission control: bounded concurrency and queueing per route class,
+    # plus optional per-client rate limiting (ADMISSION_RATE=0 disables it)
+    ADMISSION = {
+        'enabled': os.getenv('ADMISSION_CONTROL', 'false').lower() == 'true',
+        'heavy': {
+            'concurrency': int(os.getenv('ADMISSION_HEAVY_CONCURRENCY', 2)),
+            'queue_depth': int(os.getenv('ADMISSION_HEAVY_QUEUE', 4)),
+            'queue_timeout': float(os.getenv('ADMISSION_HEAVY_TIMEOUT', 5))
+        },
+        'light': {
+            'concurrency': int(os.getenv('ADMISSION_LIGHT_CONCURRENCY', 16)),
+            'queue_depth': int(os.getenv('ADMISSION_LIGHT_QUEUE', 64)),
+            'queue_timeout': float(os.getenv('ADMISSION_LIGHT_TIMEOUT', 1))
+        },
+        'rate': float(os.getenv('ADMISSION_RATE', 0)),
+        'burst': int(os.getenv('ADMISSION_BURST', 20))
+    }
@@ -0,0 +1,205 @@
+import csv
+import glob
+import os
+import tempfile
+import threading
+
+def _parse_int(value):
+    # Files written by pandas may hold integers as floats ("3.0")
+    return int(float(value))
+
+PARSERS = {
+    str: str,
+    int: _parse_int
+}
+
+# Declared column types for each CSV file, by Config.CSV key
+DROPDOWN_SCHEMA = {
+    'value': str,
+    'order_index': int
+}
+
+SCHEMAS = {
+    'data_path': {
+        'id': str,
+        'date': str,
+        'month': str,
+        'origin_country': str,
+        'main_impact_country': str,
+        'relevant_exchange': str,
+        'event_type': str,
+        'who_input': str,
+        'when_input': str,
+        'details': str
+    },
+    'countries_path': DROPDOWN_SCHEMA,
+    'exchanges_path': DROPDOWN_SCHEMA,
+    'event_types_path': DROPDOWN_SCHEMA,
+    'events_path': {
+        'id': int,
+        'event_name': str,
+        'event_type': str,
+        'origin_country': str,
+        'main_impact_country': str,
+        'relevant_exchange': str,
+        'month': str,
+        'year': str,
+        'description': str,
+        'created_at': str
+    }
+}
+
+# Held while any CSV file in the process is changed. Appends only add bytes
+# and rewrites swap in a new file, so a reader that records a file's size
+# under this lock sees a consistent version of it (see backup.py).
+write_lock = threading.Lock()
+
+def data_files(path):
+    """Existing files holding a CSV table: the file itself and any per-year partitions"""
+    stem, suffix = os.path.splitext(path)
+    paths = [path] if os.path.exists(path) else []
+    return paths + sorted(glob.glob(f'{stem}-*{suffix}'))
+
+class CsvTable:
+    """A CSV file with a declared schema, read and written with the csv module.
+
+    Rows are dicts holding exactly the schema's columns, converted to their
+    declared types; empty cells become None. Reads stream one row at a time,
+    so memory use does not grow with the file.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self.columns = list(schema)
+
+    def _ensure_exists(self):
+        if not os.path.exists(self.path):
+            with open(self.path, 'w', newline='') as f:
+                csv.writer(f, lineterminator='\n').writerow(self.columns)
+
+    def _parse(self, header, record):
+        row = dict.fromkeys(self.columns)
+        for name, value in zip(header, record):
+            if name in self.schema and value != '':
+                row[name] = PARSERS[self.schema[name]](value)
+        return row
+
+    def _serialize(self, row):
+        return ['' if row.get(name) is None else row[name] for name in self.columns]
+
+    def __iter__(self):
+        self._ensure_exists()
+        with open(self.path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, self.columns)
+            for record in reader:
+                yield self._parse(header, record)
+
+    def read_all(self):
+        return list(self)
+
+    def find(self, key, value):
+        """First row whose `key` column equals `value`, stopping at the match"""
+        value = str(value)
+        return next((row for row in self if str(row[key]) == value), None)
+
+    def append(self, row):
+        """Add one row at the end of the file without rewriting it"""
+        return self.append_many([row])[0]
+
+    def append_many(self, rows):
+        """Add rows at the end of the file in one write, synced to disk"""
+        self._ensure_exists()
+        with write_lock, open(self.path, 'a', newline='') as f:
+            csv.writer(f, lineterminator='\n').writerows(self._serialize(row) for row in rows)
+            f.flush()
+            os.fsync(f.fileno())
+        return [{name: row.get(name) for name in self.columns} for row in rows]
+
+    def write_all(self, rows):
+        """Replace the file's contents with `rows`"""
+        def fill(dst, writer):
+            writer.writerows(self._serialize(row) for row in rows)
+            return True
+        self._rewrite(fill)
+
+    def update(self, key, value, changes):
+        """Merge `changes` into the first row where key == value.
+
+        Returns the updated row, or None if there is no such row.
+        """
+        updated = []
+
+        def replace(row):
+            row.update((name, changes[name]) for name in self.columns if name in changes)
+            updated.append(row)
+            return row
+
+        return updated[0] if self._replace_first(key, value, replace) else None
+
+    def delete(self, key, value):
+        """Remove the first row where key == value; returns whether one was found"""
+        return self._replace_first(key, value, lambda row: None) is not None
+
+    def _rewrite(self, fill):
+        """Write a new version of the file next to it and rename it into place.
+
+        `fill(dst, writer)` writes the rows after the header and returns
+        False to leave the file unchanged.
+        """
+        self._ensure_exists()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            # Held throughout, so an append cannot land between reading the
+            # old file and replacing it
+            with write_lock:
+                with os.fdopen(fd, 'w', newline='') as dst:
+                    writer = csv.writer(dst, lineterminator='\n')
+                    writer.writerow(self.columns)
+                    changed = fill(dst, writer)
+                if changed:
+                    os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+                    os.replace(tmp_path, self.path)
+                else:
+                    os.unlink(tmp_path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _replace_first(self, key, value, replace):
+        """Stream the file, handing the first row where key == value to
+        `replace`, which returns the new row or None to drop it.
+
+        When the file already has the declared column layout, the rows after
+        the match are copied without being parsed. Returns the matched row,
+        or None (leaving the file untouched) when there is no match.
+        """
+        value = str(value)
+        matched = []
+
+        def fill(dst, writer):
+            with open(self.path, newline='') as src:
+                reader = csv.reader(src)
+                header = next(reader, self.columns)
+                for record in reader:
+                    row = self._parse(header, record)
+                    if str(row[key]) != value:
+                        writer.writerow(self._serialize(row))
+                        continue
+                    matched.append(dict(row))
+                    new_row = replace(row)
+                    if new_row is not None:
+                        writer.writerow(self._serialize(new_row))
+                    if header == self.columns:
+                        # csv.reader pulls whole lines from src, so the
+                        # rest of the file can be copied as is
+                        dst.writelines(src)
+                    else:
+                        writer.writerows(self._serialize(self._parse(header, rest)) for rest in reader)
+                    return True
+            return False
+
+        self._rewrite(fill)
+        return matched[0] if matched else None
@@ -1,9 +1,15 @@
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, DateTime, text
+from sqlalchemy import create_engine, event, inspect, MetaData, Table, Column, Index, Integer, String, Date, DateTime, text
 from sqlalchemy.pool import QueuePool
 from datetime import datetime
+from itertools import count
+from flask import g, has_request_context
 from config import Config
+from entry_dates import date_columns
+from partitions import partition_postgres
 
 engine = None
+read_engines = []
+_read_counter = count()
 metadata = MetaData()
 
 # Define tables
@@ -17,9 +23,15 @@ entries = Table('entries', metadata,
     Column('event_type', String),
     Column('who_input', String),
     Column('when_input', DateTime),
-    Column('details', String)
+    Column('details', String),
+    # Normalized from `date` on write
+    Column('entry_date', Date),
+    Column('year_month', String(7))
 )
 
+Index('ix_entries_entry_date', entries.c.entry_date)
+Index('ix_entries_year_month', entries.c.year_month)
+
 countries = Table('countries', metadata,
     Column('value', String, primary_key=True),
     Column('order_index', Integer)
@@ -48,27 +60,108 @@ events = Table('events', metadata,
     Column('created_at', DateTime, default=datetime.utcnow)
 )
 
+def postgres_url(host, port):
+    """PostgreSQL URL for a server, using the configured database and credentials."""
+    return f"postgresql://{Config.POSTGRES['user']}:{Config.POSTGRES['password']}@{host}:{port}/{Config.POSTGRES['database']}"
+
 def initialize_db():
-    """Initialize database connection based on configuration."""
-    global engine
+    """Initialize database connections based on configuration."""
+    global engine, read_engines
     
     if Config.STORAGE_TYPE == 'postgres':
-        db_url = f"postgresql://{Config.POSTGRES['user']}:{Config.POSTGRES['password']}@{Config.POSTGRES['host']}:{Config.POSTGRES['port']}/{Config.POSTGRES['database']}"
+        db_url = postgres_url(Config.POSTGRES['host'], Config.POSTGRES['port'])
         engine = create_engine(db_url, poolclass=QueuePool)
+        read_engines = [
+            create_engine(postgres_url(host, port), poolclass=QueuePool)
+            for host, port in Config.POSTGRES['replicas']
+        ]
     elif Config.STORAGE_TYPE == 'sqlite':
         db_url = f"sqlite:///{Config.SQLITE['filename']}"
         engine = create_engine(db_url)
+        event.listen(engine, 'connect', _enable_wal)
+        # Replica files are opened read-only; keeping them in sync is up to the deployment
+        read_engines = [
+            create_engine(f"sqlite:///file:{filename}?mode=ro&uri=true")
+            for filename in Config.SQLITE['replicas']
+        ]
     
     if engine and Config.STORAGE_TYPE in ['postgres', 'sqlite']:
         metadata.create_all(engine)
+        migrate_entry_dates(engine)
+        if Config.STORAGE_TYPE == 'postgres' and Config.PARTITIONING['enabled']:
+            partition_postgres(engine, Config.PARTITIONING['hot_years'])
+
+def migrate_entry_dates(engine, batch_size=1000):
+    """Add the normalized date columns to an existing entries table and backfill them.
+
+    Safe to run repeatedly: only rows with a date but no entry_date are
+    parsed, and rows whose date cannot be parsed are left NULL.
+    """
+    existing = {column['name'] for column in inspect(engine).get_columns('entries')}
+    with engine.begin() as conn:
+        if 'entry_date' not in existing:
+            conn.execute(text('ALTER TABLE entries ADD COLUMN entry_date DATE'))
+        if 'year_month' not in existing:
+            conn.execute(text('ALTER TABLE entries ADD COLUMN year_month VARCHAR(7)'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_entries_entry_date ON entries (entry_date)'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_entries_year_month ON entries (year_month)'))
+
+    select = text(
+        'SELECT id, date FROM entries WHERE entry_date IS NULL AND date IS NOT NULL '
+        'AND id > :after ORDER BY id LIMIT :limit'
+    )
+    update = text('UPDATE entries SET entry_date = :entry_date, year_month = :year_month WHERE id = :id')
+    # Walk the pending rows by id, one batch per transaction; unparseable
+    # rows stay pending, so the id cursor is what moves past them
+    after = ''
+    while True:
+        with engine.begin() as conn:
+            batch = conn.execute(select, {'after': after, 'limit': batch_size}).fetchall()
+            if not batch:
+                return
+            updates = [{'id': row.id, **date_columns(row.date)} for row in batch]
+            updates = [row for row in updates if row['entry_date']]
+            if updates:
+                conn.execute(update, updates)
+        after = batch[-1].id
+
+def _enable_wal(dbapi_connection, connection_record):
+    # With write-ahead logging, readers (including online backups) never block writers
+    dbapi_connection.execute('PRAGMA journal_mode=WAL')
+
+def mark_write():
+    """Send the rest of the current request's reads to the primary."""
+    if has_request_context():
+        g.db_wrote = True
 
 def get_db():
-    """Get database engine."""
+    """Get the primary (write) database engine."""
     if not engine and Config.STORAGE_TYPE in ['postgres', 'sqlite']:
         initialize_db()
+    mark_write()
     return engine
 
+def get_read_db():
+    """Get a database engine for read-only queries.
+
+    Replicas are used in turn. Once the current request has written, its
+    reads go to the primary so they see that write.
+    """
+    if not engine and Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        initialize_db()
+    if not read_engines or (has_request_context() and g.get('db_wrote')):
+        return engine
+    if has_request_context():
+        g.db_read_replica = True
+    return read_engines[next(_read_counter) % len(read_engines)]
+
+def read_from_replica():
+    """Whether the current request has read from a replica, which may lag the primary."""
+    return has_request_context() and g.get('db_read_replica', False)
+
 def close_db():
-    """Close database connection."""
+    """Close database connections."""
+    for read_engine in read_engines:
+        read_engine.dispose()
     if engine:
         engine.dispose() 
\ No newline at end of file
@@ -0,0 +1,83 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+# Formats accepted for an entry's free-form date, tried in order after ISO 8601
+DATE_FORMATS = ['%Y/%m/%d', '%m/%d/%Y', '%d %B %Y', '%d %b %Y', '%B %d, %Y', '%b %d, %Y']
+
+def parse_entry_date(value):
+    """Normalize an entry's date string to a date, or None if it cannot be read"""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    try:
+        # Also accepts datetimes such as 2024-02-15T10:30:00Z
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def year_month(day):
+    """Year-month key, e.g. '2024-02', for a date"""
+    return day.strftime('%Y-%m') if day else None
+
+def date_columns(value):
+    """The normalized `entry_date` (ISO string) and `year_month` for a date string"""
+    day = parse_entry_date(value)
+    return {
+        'entry_date': day.isoformat() if day else None,
+        'year_month': year_month(day)
+    }
+
+def with_date_columns(row):
+    """A CSV row with the `entry_date` and `year_month` SQL rows carry"""
+    return {**row, **date_columns(row.get('date'))}
+
+class EntryDateIndex:
+    """Entries sorted by their parsed date, for range queries by binary search.
+
+    Rows gain the same `entry_date` and `year_month` fields as in SQL mode.
+    Entries whose date cannot be parsed are left out of the index.
+    """
+
+    def __init__(self, rows):
+        dated = sorted(
+            ((day, row) for row in rows if (day := parse_entry_date(row.get('date'))) is not None),
+            key=lambda pair: pair[0]
+        )
+        self.dates = [day for day, _ in dated]
+        self.rows = [{**row, 'entry_date': day.isoformat(), 'year_month': year_month(day)}
+                     for day, row in dated]
+
+    def between(self, start=None, end=None):
+        """Entries dated from `start` to `end`, both inclusive; None is unbounded"""
+        lo = bisect_left(self.dates, start) if start else 0
+        hi = bisect_right(self.dates, end) if end else len(self.dates)
+        return self.rows[lo:hi]
+
+# Indexes of CSV files, keyed by path and validated against mtime and size
+_indexes = {}
+_lock = threading.Lock()
+
+def csv_date_index(table):
+    """Date index over a CsvTable, rebuilt only when its file changes"""
+    if not os.path.exists(table.path):
+        return EntryDateIndex([])
+    stat = os.stat(table.path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _indexes.get(table.path)
+        if cached and cached[0] == key:
+            return cached[1]
+    index = EntryDateIndex(table)
+    with _lock:
+        _indexes[table.path] = (key, index)
+    return index
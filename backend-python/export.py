@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timezone
+from itertools import islice
+
+# Rows serialized per chunk of the response
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+def parse_timestamp(value):
+    """Naive UTC datetime, to the second, from an ISO 8601 string with a 'T'
+    or space separator and an optional 'Z' or offset; None if unreadable"""
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+def chunked(rows, size=EXPORT_CHUNK_ROWS):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+def csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(columns)
+    for chunk in chunked(rows):
+        writer.writerows([row[name] for name in columns] for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def ndjson_chunks(rows, columns):
+    for chunk in chunked(rows):
+        yield ''.join(json.dumps({name: row[name] for name in columns}, default=_json_default) + '\n'
+                      for row in chunk)
+
+class _ChunkSink:
+    """Write-only file object collecting what the Parquet writer produces"""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+def parquet_chunks(rows, columns, types):
+    """One Parquet row group per chunk; `types` maps column to python type"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {int: pa.int64(), str: pa.string(), date: pa.date32(), datetime: pa.timestamp('us')}
+    schema = pa.schema([(name, arrow_types.get(types[name], pa.string())) for name in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+    for chunk in chunked(rows):
+        writer.write_table(pa.Table.from_pylist([{name: row[name] for name in columns} for row in chunk], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def export_chunks(rows, columns, types, fmt):
+    """Serialize rows in the given format, one chunk at a time"""
+    if fmt == 'csv':
+        return csv_chunks(rows, columns)
+    if fmt == 'ndjson':
+        return ndjson_chunks(rows, columns)
+    return parquet_chunks(rows, columns, types)
@@ -0,0 +1,306 @@
+"""Move the CSV data files into SQLite or PostgreSQL.
+
+Each table is streamed from its CSV files (per-year partitions included)
+in chunks of --chunk-size rows. PostgreSQL loads a chunk with COPY, SQLite
+with executemany, one transaction per chunk. The same transaction records
+a checkpoint in the target database (rows loaded so far and a running
+checksum), so an interrupted migration resumes after the last committed
+chunk. Secondary indexes are dropped before a table is loaded and rebuilt
+after it. Finally the row count and an order-independent checksum of every
+table are compared with the CSV files.
+
+    python migrate.py --to sqlite
+    python migrate.py --to postgres --chunk-size 100000
+    python migrate.py --to sqlite --verify-only
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+from itertools import islice
+from sqlalchemy import DateTime, text
+
+from config import Config
+import csv_store
+import db
+from entry_dates import date_columns
+from partitions import partition_postgres
+
+# Loaded in this order, by Config.CSV key
+TABLES = [
+    ('countries', 'countries_path'),
+    ('exchanges', 'exchanges_path'),
+    ('event_types', 'event_types_path'),
+    ('entries', 'data_path'),
+    ('events', 'events_path')
+]
+
+CHECKPOINTS = 'csv_migration'
+
+class MigrationError(Exception):
+    """The migration cannot continue or did not verify."""
+
+def source_rows(key):
+    """Rows of a CSV table across all of its files, in file order"""
+    for path in csv_store.data_files(Config.CSV[key]):
+        yield from csv_store.CsvTable(path, csv_store.SCHEMAS[key])
+
+def fingerprint(key):
+    """Identifies the CSV files a checkpoint was taken against"""
+    files = []
+    for path in csv_store.data_files(Config.CSV[key]):
+        stat = os.stat(path)
+        files.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return json.dumps(files)
+
+def canonical(value, is_datetime):
+    """Text form of a value that is the same whether read from CSV, SQLite or PostgreSQL"""
+    if value is None or value == '':
+        return ''
+    if is_datetime:
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return value
+        # timestamp columns keep the wall-clock time and drop any offset
+        return value.replace(tzinfo=None).isoformat()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+class Checksum:
+    """Sum of per-row SHA-256 prefixes mod 2**64, so row order does not matter"""
+
+    def __init__(self, columns, datetime_columns, value=0):
+        self.columns = columns
+        self.datetime_columns = datetime_columns
+        self.value = value
+
+    def add(self, row):
+        line = '\x1f'.join(canonical(row[name], name in self.datetime_columns) for name in self.columns)
+        digest = hashlib.sha256(line.encode()).digest()
+        self.value = (self.value + int.from_bytes(digest[:8], 'big')) % 2 ** 64
+
+class Migration:
+    """Loads the CSV tables into `engine`, whose schema initialize_db has created."""
+
+    def __init__(self, engine, chunk_size, log=print):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.log = log
+        self.postgres = engine.dialect.name == 'postgresql'
+        self.placeholder = '%s' if self.postgres else '?'
+        with engine.begin() as conn:
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS {CHECKPOINTS} ('
+                'source VARCHAR PRIMARY KEY, fingerprint VARCHAR, rows_loaded INTEGER, '
+                'checksum VARCHAR, completed INTEGER)'
+            ))
+
+    def table(self, name):
+        return db.metadata.tables[name]
+
+    def columns(self, name, key):
+        """Columns loaded for a table: the CSV's, plus the normalized entry dates"""
+        columns = list(csv_store.SCHEMAS[key])
+        return columns + ['entry_date', 'year_month'] if name == 'entries' else columns
+
+    def checksum(self, name, key, value=0):
+        table = self.table(name)
+        datetime_columns = {column.name for column in table.columns if isinstance(column.type, DateTime)}
+        return Checksum(list(csv_store.SCHEMAS[key]), datetime_columns, value)
+
+    def checkpoint(self, key):
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f'SELECT * FROM {CHECKPOINTS} WHERE source = :source'),
+                               {'source': key}).fetchone()
+        return row._mapping if row else None
+
+    def restart(self):
+        """Forget every checkpoint and empty the target tables"""
+        with self.engine.begin() as conn:
+            for name, _ in reversed(TABLES):
+                conn.execute(text(f'DELETE FROM {name}'))
+            conn.execute(text(f'DELETE FROM {CHECKPOINTS}'))
+
+    def run(self):
+        for name, key in TABLES:
+            self.load(name, key)
+        return self.verify()
+
+    def load(self, name, key):
+        current = fingerprint(key)
+        state = self.checkpoint(key)
+        if state and state['completed']:
+            self.log(f'{name}: already migrated ({state["rows_loaded"]} rows)')
+            return
+        if state and state['fingerprint'] != current:
+            raise MigrationError(f'{name}: the CSV files changed since the interrupted run; rerun with --restart')
+        if not state:
+            with self.engine.connect() as conn:
+                if conn.execute(text(f'SELECT 1 FROM {name} LIMIT 1')).first():
+                    raise MigrationError(f'{name} already has rows; rerun with --restart to replace them')
+            self.save(None, key, current, 0, 0, False)
+
+        loaded = state['rows_loaded'] if state else 0
+        checksum = self.checksum(name, key, int(state['checksum']) if state else 0)
+        columns = self.columns(name, key)
+        self.drop_indexes(name)
+        if loaded:
+            self.log(f'{name}: resuming after {loaded} rows')
+        started, resumed_at = time.monotonic(), loaded
+        rows = islice(source_rows(key), loaded, None)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            for row in chunk:
+                checksum.add(row)
+                if name == 'entries':
+                    row.update(date_columns(row['date']))
+            loaded += len(chunk)
+            self.write_chunk(name, columns, chunk, key, current, loaded, checksum.value)
+            rate = (loaded - resumed_at) / max(time.monotonic() - started, 1e-9)
+            self.log(f'{name}: {loaded} rows ({rate:.0f} rows/s)')
+
+        self.rebuild_indexes(name)
+        if self.postgres and name == 'events':
+            with self.engine.begin() as conn:
+                conn.execute(text("SELECT setval('events_id_seq', COALESCE((SELECT MAX(id) FROM events), 0) + 1, false)"))
+        with self.engine.begin() as conn:
+            conn.execute(text(f'UPDATE {CHECKPOINTS} SET completed = 1 WHERE source = :source'), {'source': key})
+
+    def save(self, cursor, key, current, loaded, checksum, completed):
+        """Record progress, in the chunk's transaction when given its cursor"""
+        if cursor is None:
+            with self.engine.begin() as conn:
+                conn.execute(text(
+                    f'INSERT INTO {CHECKPOINTS} (source, fingerprint, rows_loaded, checksum, completed) '
+                    'VALUES (:source, :fingerprint, :rows_loaded, :checksum, :completed)'
+                ), {'source': key, 'fingerprint': current, 'rows_loaded': loaded,
+                    'checksum': str(checksum), 'completed': int(completed)})
+            return
+        p = self.placeholder
+        cursor.execute(f'UPDATE {CHECKPOINTS} SET rows_loaded = {p}, checksum = {p} WHERE source = {p}',
+                       (loaded, str(checksum), key))
+
+    def write_chunk(self, name, columns, chunk, key, current, loaded, checksum):
+        """Insert one chunk and advance the checkpoint in a single transaction"""
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if self.postgres:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, lineterminator='\n')
+                # Unquoted empty fields are NULL in COPY's csv format
+                writer.writerows(['' if row.get(column) is None else row[column] for column in columns]
+                                 for row in chunk)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:
+                cursor.executemany(
+                    f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [tuple(row.get(column) for column in columns) for row in chunk]
+                )
+            self.save(cursor, key, current, loaded, checksum, False)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+
+    def drop_indexes(self, name):
+        """Drop the table's secondary indexes so the load does not maintain them row by row"""
+        with self.engine.begin() as conn:
+            for index in self.table(name).indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+
+    def rebuild_indexes(self, name):
+        started = time.monotonic()
+        indexes = self.table(name).indexes
+        for index in indexes:
+            index.create(self.engine, checkfirst=True)
+        with self.engine.begin() as conn:
+            conn.execute(text(f'ANALYZE {name}'))
+        if indexes:
+            self.log(f'{name}: rebuilt {len(indexes)} indexes in {time.monotonic() - started:.1f}s')
+
+    def verify(self, recompute=False):
+        """Compare each table's row count and checksum with the CSV files.
+
+        Uses the totals recorded while loading, or with `recompute` reads
+        the CSV files again. Returns a report per table.
+        """
+        report = {}
+        for name, key in TABLES:
+            expected = self.checksum(name, key)
+            if recompute:
+                count = 0
+                for row in source_rows(key):
+                    expected.add(row)
+                    count += 1
+            else:
+                state = self.checkpoint(key)
+                if not state or not state['completed']:
+                    raise MigrationError(f'{name} has not been migrated yet')
+                count, expected.value = state['rows_loaded'], int(state['checksum'])
+            actual = self.checksum(name, key)
+            rows = 0
+            with self.engine.connect() as conn:
+                # Raw text results, so SQLite timestamps come back as stored
+                result = conn.execution_options(stream_results=True).execute(
+                    text(f"SELECT {', '.join(actual.columns)} FROM {name}"))
+                for row in result:
+                    actual.add(row._mapping)
+                    rows += 1
+            report[name] = {
+                'csv_rows': count, 'db_rows': rows,
+                'checksum_ok': expected.value == actual.value,
+                'ok': count == rows and expected.value == actual.value
+            }
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--to', choices=['sqlite', 'postgres'], default='sqlite', help='target database (default: sqlite)')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='rows per transaction (default: 50000)')
+    parser.add_argument('--restart', action='store_true', help='discard checkpoints and empty the target tables first')
+    parser.add_argument('--verify-only', action='store_true', help='compare the database with the CSV files, loading nothing')
+    args = parser.parse_args()
+
+    Config.STORAGE_TYPE = args.to
+    # Load into plain tables; they are partitioned afterwards in one pass
+    partitioning = Config.PARTITIONING['enabled']
+    Config.PARTITIONING['enabled'] = False
+    db.initialize_db()
+
+    migration = Migration(db.engine, args.chunk_size)
+    try:
+        if args.verify_only:
+            report = migration.verify(recompute=True)
+        else:
+            if args.restart:
+                migration.restart()
+            report = migration.run()
+            if partitioning and args.to == 'postgres':
+                partition_postgres(db.engine, Config.PARTITIONING['hot_years'])
+    except MigrationError as e:
+        print(f'Migration failed: {e}', file=sys.stderr)
+        return 1
+
+    for name, result in report.items():
+        status = 'ok' if result['ok'] else 'MISMATCH'
+        print(f"{name}: {result['csv_rows']} CSV rows, {result['db_rows']} database rows, "
+              f"checksum {'matches' if result['checksum_ok'] else 'differs'} - {status}")
+    return 0 if all(result['ok'] for result in report.values()) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
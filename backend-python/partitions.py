@@ -0,0 +1,323 @@
+import glob
+import os
+import re
+import threading
+from datetime import date
+from sqlalchemy import text
+
+import csv_store
+from csv_store import CsvTable
+from entry_dates import parse_entry_date
+from utils.errors import APIError
+
+# Partition for rows whose year cannot be determined
+UNDATED = 'undated'
+
+# Marker trigger on read-only Postgres partitions
+READONLY_TRIGGER = 'partition_readonly'
+
+# SQLSTATE the trigger raises, so the error can be told apart from others
+READONLY_SQLSTATE = 'P0R01'
+
+class ReadOnlyPartitionError(APIError):
+    """Raised when a write targets a partition that is no longer hot."""
+    def __init__(self, year):
+        super().__init__(f"Data for {year} is archived and read-only", status_code=409)
+
+def readonly_partition_error(error):
+    """The ReadOnlyPartitionError for a database error raised by the
+    read-only trigger, or None for any other error"""
+    orig = getattr(error, 'orig', None)
+    sqlstate = getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)
+    if sqlstate != READONLY_SQLSTATE:
+        return None
+    match = re.search(r'_y(\d{4})', str(orig))
+    return ReadOnlyPartitionError(match.group(1) if match else 'this year')
+
+def first_hot_year(hot_years):
+    """First hot year: partitions for earlier years are read-only"""
+    return date.today().year - hot_years + 1
+
+def entry_year(row):
+    day = parse_entry_date(row.get('date'))
+    return day.year if day else UNDATED
+
+def event_year(row):
+    value = str(row.get('year') or '').strip()
+    return int(value) if value.isdigit() else UNDATED
+
+def entry_sort_key(row):
+    return parse_entry_date(row.get('date')) or date.min
+
+def event_sort_key(row):
+    return row.get('id') or 0
+
+# How each partitioned CSV file is split and ordered, by Config.CSV key
+CSV_PARTITIONING = {
+    'data_path': (entry_year, entry_sort_key),
+    'events_path': (event_year, event_sort_key)
+}
+
+_split_lock = threading.Lock()
+
+class PartitionedCsvTable:
+    """A CSV table stored as one file per year next to its original path.
+
+    `data.csv` becomes `data-2023.csv`, `data-2024.csv`, ... plus
+    `data-undated.csv`. It offers the same row operations as CsvTable;
+    reads can be limited to a range of years so other files are never
+    opened. Years before `first_hot_year` are read-only.
+    """
+
+    def __init__(self, path, schema, partition_key, sort_key, first_hot_year):
+        self.path = path
+        self.schema = schema
+        self.columns = list(schema)
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.first_hot_year = first_hot_year
+        self._stem, self._suffix = os.path.splitext(path)
+        self._split_original()
+
+    def partition_path(self, year):
+        return f'{self._stem}-{year}{self._suffix}'
+
+    def partition(self, year):
+        return CsvTable(self.partition_path(year), self.schema)
+
+    def years(self):
+        """Years with a partition file, in order"""
+        pattern = re.compile(re.escape(os.path.basename(self._stem)) + r'-(\d{4})' + re.escape(self._suffix) + '$')
+        matches = (pattern.match(os.path.basename(path)) for path in glob.glob(self.partition_path('*')))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def partition_years(self, first_year=None, last_year=None):
+        """Partition years overlapping the given range; UNDATED only when unbounded"""
+        bounded = first_year is not None or last_year is not None
+        years = [
+            year for year in self.years()
+            if (first_year is None or year >= first_year) and (last_year is None or year <= last_year)
+        ]
+        if not bounded and os.path.exists(self.partition_path(UNDATED)):
+            years.append(UNDATED)
+        return years
+
+    def partitions(self, first_year=None, last_year=None):
+        """Partitions overlapping the given years, so the others are never read"""
+        return [self.partition(year) for year in self.partition_years(first_year, last_year)]
+
+    def is_writable(self, year):
+        return year == UNDATED or year >= self.first_hot_year
+
+    def _check_writable(self, year):
+        if not self.is_writable(year):
+            raise ReadOnlyPartitionError(year)
+
+    def _split_original(self):
+        """Move the rows of an unpartitioned file into per-year files, once"""
+        with _split_lock:
+            if not os.path.exists(self.path):
+                return
+            batches = {}
+            for row in CsvTable(self.path, self.schema):
+                batches.setdefault(self.partition_key(row), []).append(row)
+            for year, rows in batches.items():
+                self.partition(year).append_many(rows)
+            # Kept as a backup; it is no longer read. Renamed under the write
+            # lock like every other replacement, so a backup sees the file
+            # either before or after the move
+            with csv_store.write_lock:
+                os.replace(self.path, self.path + '.unpartitioned')
+
+    def __iter__(self):
+        for table in self.partitions():
+            yield from table
+
+    def read_all(self):
+        return list(self)
+
+    def find(self, key, value):
+        return next((row for row in (table.find(key, value) for table in self.partitions()) if row), None)
+
+    def append(self, row):
+        return self.append_many([row])[0]
+
+    def append_many(self, rows):
+        """Append rows to their partitions, one write per partition"""
+        batches = {}
+        for i, row in enumerate(rows):
+            year = self.partition_key(row)
+            self._check_writable(year)
+            batches.setdefault(year, []).append((i, row))
+        results = [None] * len(rows)
+        for year, batch in batches.items():
+            stored = self.partition(year).append_many([row for _, row in batch])
+            for (i, _), row in zip(batch, stored):
+                results[i] = row
+        return results
+
+    def _locate(self, key, value):
+        """(year, row) of the first row where key == value, newest partitions first"""
+        for year in reversed(self.partition_years()):
+            row = self.partition(year).find(key, value)
+            if row:
+                return year, row
+        return None, None
+
+    def update(self, key, value, changes):
+        year, row = self._locate(key, value)
+        if row is None:
+            return None
+        self._check_writable(year)
+        new_row = {**row, **{name: changes[name] for name in self.columns if name in changes}}
+        new_year = self.partition_key(new_row)
+        if new_year == year:
+            return self.partition(year).update(key, value, changes)
+        # The row's year changed, so it moves to another partition
+        self._check_writable(new_year)
+        self.partition(year).delete(key, value)
+        return self.partition(new_year).append(new_row)
+
+    def delete(self, key, value):
+        year, row = self._locate(key, value)
+        if row is None:
+            return False
+        self._check_writable(year)
+        return self.partition(year).delete(key, value)
+
+    def compact(self):
+        """Sort each cold partition's rows, rewrite it and make the file read-only.
+
+        Files that are already read-only are skipped, so this only does work
+        when a year turns cold. Returns the years compacted.
+        """
+        compacted = []
+        for year in self.years():
+            path = self.partition_path(year)
+            if self.is_writable(year) or not os.stat(path).st_mode & 0o200:
+                continue
+            table = self.partition(year)
+            table.write_all(sorted(table, key=self.sort_key))
+            os.chmod(path, os.stat(path).st_mode & ~0o222)
+            compacted.append(year)
+        return compacted
+
+def partition_postgres(engine, hot_years):
+    """Convert entries and events to tables partitioned by year, if they are not yet.
+
+    entries is range-partitioned on entry_date, events list-partitioned on
+    year. Rows without a usable key go to a default partition. Partitions
+    for years before the hot window get a trigger rejecting writes and are
+    compacted with VACUUM FULL.
+
+    A primary key on a partitioned table must include the partition key,
+    which can be NULL here, so each partition gets a unique index on id
+    instead. Ids are then unique within a partition; across partitions
+    they rely on the id generators (entry timestamps, the events sequence).
+    """
+    this_year = date.today().year
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION reject_partition_write() RETURNS trigger AS $$
+            BEGIN
+                RAISE EXCEPTION 'partition % is read-only', TG_TABLE_NAME
+                    USING ERRCODE = '{READONLY_SQLSTATE}';
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        if not _is_partitioned(conn, 'entries'):
+            years = _scalars(conn, 'SELECT DISTINCT EXTRACT(YEAR FROM entry_date)::int FROM entries WHERE entry_date IS NOT NULL')
+            _convert_table(conn, 'entries', 'RANGE (entry_date)', ['entry_date', 'year_month'])
+            for year in years:
+                _create_year_partition(conn, 'entries', year)
+            conn.execute(text('INSERT INTO entries SELECT * FROM entries_unpartitioned'))
+            conn.execute(text('DROP TABLE entries_unpartitioned'))
+        if not _is_partitioned(conn, 'events'):
+            years = _scalars(conn, "SELECT DISTINCT year::int FROM events WHERE year ~ '^[0-9]{4}$'")
+            # The id sequence must outlive the table it was created with
+            conn.execute(text('ALTER SEQUENCE events_id_seq OWNED BY NONE'))
+            _convert_table(conn, 'events', 'LIST (year)', ['year', 'created_at'])
+            for year in years:
+                _create_year_partition(conn, 'events', year)
+            conn.execute(text('INSERT INTO events SELECT * FROM events_unpartitioned'))
+            conn.execute(text('DROP TABLE events_unpartitioned'))
+            conn.execute(text('ALTER SEQUENCE events_id_seq OWNED BY events.id'))
+        # New rows for the current and next year land in their own partitions
+        for table in ['entries', 'events']:
+            for year in [this_year, this_year + 1]:
+                _create_year_partition(conn, table, year)
+    compact_postgres(engine, hot_years)
+
+def compact_postgres(engine, hot_years):
+    """Make partitions that turned cold read-only and compact them"""
+    first_hot = first_hot_year(hot_years)
+    cold = []
+    with engine.begin() as conn:
+        for table in ['entries', 'events']:
+            for name in _scalars(conn, """
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = :table
+                AND NOT EXISTS (SELECT 1 FROM pg_trigger t WHERE t.tgrelid = c.oid AND t.tgname = :trigger)
+            """, table=table, trigger=READONLY_TRIGGER):
+                match = re.fullmatch(rf'{table}_y(\d{{4}})', name)
+                if match and int(match.group(1)) < first_hot:
+                    conn.execute(text(
+                        f'CREATE TRIGGER {READONLY_TRIGGER} BEFORE INSERT OR UPDATE OR DELETE ON {name} '
+                        'FOR EACH ROW EXECUTE FUNCTION reject_partition_write()'
+                    ))
+                    cold.append(name)
+    # VACUUM cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for name in cold:
+            conn.execute(text(f'VACUUM (FULL, ANALYZE) {name}'))
+    return cold
+
+def _scalars(conn, query, **params):
+    return [row[0] for row in conn.execute(text(query), params)]
+
+def _is_partitioned(conn, table):
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p')"),
+        {'table': table}
+    ).scalar() == 'p'
+
+def _convert_table(conn, table, partition_by, indexed):
+    """Set `table` aside and create an empty partitioned table in its place"""
+    conn.execute(text(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned'))
+    for index in _scalars(conn, 'SELECT indexname FROM pg_indexes WHERE tablename = :table',
+                          table=f'{table}_unpartitioned'):
+        conn.execute(text(f'ALTER INDEX {index} RENAME TO {index}_unpartitioned'))
+    conn.execute(text(
+        f'CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS) PARTITION BY {partition_by}'
+    ))
+    conn.execute(text(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT'))
+    _unique_ids(conn, f'{table}_default')
+    for column in indexed:
+        conn.execute(text(f'CREATE INDEX ix_{table}_{column} ON {table} ({column})'))
+
+def _unique_ids(conn, partition):
+    conn.execute(text(f'CREATE UNIQUE INDEX {partition}_id_key ON {partition} (id)'))
+
+def _create_year_partition(conn, table, year):
+    """Create a year's partition, moving in rows the default partition holds for it"""
+    name = f'{table}_y{year}'
+    if conn.execute(text('SELECT to_regclass(:name)'), {'name': name}).scalar():
+        return
+    if table == 'entries':
+        bounds = f"FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        condition = f"entry_date >= '{year}-01-01' AND entry_date < '{year + 1}-01-01'"
+    else:
+        bounds = f"IN ('{year}')"
+        condition = f"year = '{year}'"
+    # A partition cannot be attached while the default partition has rows for it
+    conn.execute(text(f'CREATE TEMP TABLE moved_rows (LIKE {table}) ON COMMIT DROP'))
+    conn.execute(text(
+        f'WITH moved AS (DELETE FROM {table}_default WHERE {condition} RETURNING *) '
+        'INSERT INTO moved_rows SELECT * FROM moved'
+    ))
+    conn.execute(text(f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}'))
+    _unique_ids(conn, name)
+    conn.execute(text(f'INSERT INTO {table} SELECT * FROM moved_rows'))
+    conn.execute(text('DROP TABLE moved_rows'))
@@ -0,0 +1,113 @@
+import os
+import threading
+from array import array
+from calendar import month_name
+from collections import Counter
+
+# Event columns that can be pivoted on or filtered by
+PIVOT_DIMENSIONS = ['origin_country', 'main_impact_country', 'relevant_exchange', 'event_type', 'month', 'year']
+
+MONTHS = list(month_name)[1:]
+
+def label_order(dimension, totals):
+    """Labels in display order: months by calendar, years ascending, others by count"""
+    if dimension == 'month':
+        key = lambda label: (MONTHS.index(label) if label in MONTHS else len(MONTHS), label)
+    elif dimension == 'year':
+        key = lambda label: (len(label), label)
+    else:
+        key = lambda label: (-totals[label], label)
+    return sorted(totals, key=key)
+
+def dense_matrix(counts, rows, cols):
+    """Heatmap payload for {(row label, col label): count}.
+
+    `values[i][j]` is the count for `row_labels[i]` and `col_labels[j]`,
+    zero where no event has that pair.
+    """
+    row_totals = Counter()
+    col_totals = Counter()
+    for (row, col), n in counts.items():
+        row_totals[row] += n
+        col_totals[col] += n
+    row_labels = label_order(rows, row_totals)
+    col_labels = label_order(cols, col_totals)
+    col_index = {label: j for j, label in enumerate(col_labels)}
+    values = [[0] * len(col_labels) for _ in row_labels]
+    row_index = {label: i for i, label in enumerate(row_labels)}
+    for (row, col), n in counts.items():
+        values[row_index[row]][col_index[col]] = n
+    return {
+        'rows': rows,
+        'cols': cols,
+        'row_labels': row_labels,
+        'col_labels': col_labels,
+        'values': values,
+        'row_totals': [row_totals[label] for label in row_labels],
+        'col_totals': [col_totals[label] for label in col_labels],
+        'total': sum(row_totals.values())
+    }
+
+class EncodedColumns:
+    """The pivot dimensions of a CSV file as integer codes, one array per column.
+
+    `labels[column]` lists each column's distinct values; code -1 is an
+    empty cell. Counting a pair of columns is then one bincount.
+    """
+
+    def __init__(self, rows):
+        # numpy is only loaded once a CSV pivot is requested
+        import numpy as np
+
+        self.labels = {column: [] for column in PIVOT_DIMENSIONS}
+        codes = {column: array('i') for column in PIVOT_DIMENSIONS}
+        lookups = {column: {} for column in PIVOT_DIMENSIONS}
+        for row in rows:
+            for column in PIVOT_DIMENSIONS:
+                value = row[column]
+                if value is None:
+                    codes[column].append(-1)
+                    continue
+                value = str(value)
+                code = lookups[column].get(value)
+                if code is None:
+                    code = lookups[column][value] = len(self.labels[column])
+                    self.labels[column].append(value)
+                codes[column].append(code)
+        self.codes = {column: np.frombuffer(values, dtype=np.int32) for column, values in codes.items()}
+
+    def counts(self, rows, cols, filters):
+        """{(row label, col label): count} over events matching every filter"""
+        import numpy as np
+
+        row_codes, col_codes = self.codes[rows], self.codes[cols]
+        mask = (row_codes >= 0) & (col_codes >= 0)
+        for column, values in filters.items():
+            lookup = {label: code for code, label in enumerate(self.labels[column])}
+            mask &= np.isin(self.codes[column], [lookup[value] for value in values if value in lookup])
+        width = len(self.labels[cols])
+        matrix = np.bincount(row_codes[mask].astype(np.int64) * width + col_codes[mask],
+                             minlength=len(self.labels[rows]) * width)
+        return {
+            (self.labels[rows][cell // width], self.labels[cols][cell % width]): int(matrix[cell])
+            for cell in np.flatnonzero(matrix)
+        }
+
+# Encoded CSV files, keyed by path and validated against mtime and size
+_encoded = {}
+_lock = threading.Lock()
+
+def csv_encoded_columns(table):
+    """Encoded pivot columns of a CsvTable, rebuilt only when its file changes"""
+    if not os.path.exists(table.path):
+        return EncodedColumns([])
+    stat = os.stat(table.path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _encoded.get(table.path)
+        if cached and cached[0] == key:
+            return cached[1]
+    encoded = EncodedColumns(table)
+    with _lock:
+        _encoded[table.path] = (key, encoded)
+    return encoded
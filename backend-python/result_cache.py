@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Bookkeeping per entry (key tuple, dict slots, list links), on top of the body
+ENTRY_OVERHEAD = 512
+
+class ResultCache:
+    """Bounded LRU cache of serialized read results.
+
+    Each entry is charged the size given by the caller plus ENTRY_OVERHEAD,
+    and the least recently used entries are evicted to stay within
+    `max_bytes`. A result larger than a quarter of the cache is not stored,
+    so one huge read cannot flush everything else. Entries remember the
+    tables they were read from; `invalidate(table)` drops those depending on
+    it. With a positive `ttl`, entries also expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_bytes, ttl=0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """The cached value for `key`, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and time.monotonic() - entry[3] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size, tables):
+        size += ENTRY_OVERHEAD
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, tables, time.monotonic())
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, table):
+        """Drop every entry read from `table`"""
+        with self._lock:
+            for key in list(self._by_table.get(table, ())):
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size, tables, _ = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table[table]
+            keys.discard(key)
+            if not keys:
+                del self._by_table[table]
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
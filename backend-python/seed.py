@@ -0,0 +1,227 @@
+"""Fill the configured storage with a synthetic dataset.
+
+Generates entries and events whose countries, exchanges and event types
+come from the dropdown tables, with a long-tailed (Zipf) popularity: a few
+countries and event types account for most rows, as in real data. Empty
+dropdown tables are filled with a default list first. Rows are written in
+batches to whichever STORAGE_TYPE is configured; the same --seed always
+produces the same rows.
+
+    STORAGE_TYPE=sqlite python seed.py --entries 100000 --events 100000
+"""
+
+import argparse
+import random
+import sys
+import time
+from calendar import month_name
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import insert, text
+
+from config import Config
+from entry_dates import year_month
+from partitions import PartitionedCsvTable
+import versions
+
+DEFAULT_DROPDOWNS = {
+    'countries': [
+        'USA', 'China', 'UK', 'Japan', 'Germany', 'France', 'India', 'Canada', 'Hong Kong',
+        'Switzerland', 'Australia', 'South Korea', 'Brazil', 'Netherlands', 'Singapore',
+        'Italy', 'Spain', 'Saudi Arabia', 'Mexico', 'Sweden', 'Russia', 'Taiwan',
+        'South Africa', 'UAE', 'Indonesia', 'Turkey', 'Norway', 'Poland', 'Argentina', 'Chile'
+    ],
+    'exchanges': [
+        'NYSE', 'NASDAQ', 'SSE', 'JPX', 'Euronext', 'SZSE', 'HKEX', 'LSE', 'NSE', 'TSX',
+        'DB', 'SIX', 'KRX', 'ASX', 'Tadawul', 'B3', 'SGX', 'JSE', 'BME', 'BMV'
+    ],
+    'event_types': [
+        'Earnings', 'Central Bank', 'Economic Data', 'Election', 'Regulation', 'Merger',
+        'IPO', 'Conference', 'Geopolitical', 'Natural Disaster', 'Trade Policy', 'Default'
+    ]
+}
+
+DESCRIPTION_WORDS = (
+    'market rates policy growth outlook guidance inflation volatility liquidity '
+    'demand supply revenue margin forecast surprise consensus sector index bond equity'
+).split()
+
+def zipf_weights(n, s):
+    """Cumulative weights giving the k-th value probability proportional to 1 / k**s"""
+    return list(accumulate(1 / rank ** s for rank in range(1, n + 1)))
+
+class Generator:
+    """Deterministic rows for `dropdowns` (table -> values, most popular first)."""
+
+    def __init__(self, dropdowns, first_year, last_year, seed=0, skew=1.1):
+        self.rng = random.Random(seed)
+        self.dropdowns = dropdowns
+        self.weights = {table: zipf_weights(len(values), skew) for table, values in dropdowns.items()}
+        self.first_day = date(first_year, 1, 1)
+        self.days = (date(last_year, 12, 31) - self.first_day).days + 1
+
+    def pick(self, table):
+        return self.rng.choices(self.dropdowns[table], cum_weights=self.weights[table])[0]
+
+    def common_fields(self):
+        """Fields entries and events share; impact stays in the origin country most of the time"""
+        day = self.first_day + timedelta(days=self.rng.randrange(self.days))
+        origin = self.pick('countries')
+        return day, {
+            'month': month_name[day.month],
+            'origin_country': origin,
+            'main_impact_country': origin if self.rng.random() < 0.6 else self.pick('countries'),
+            'relevant_exchange': self.pick('exchanges'),
+            'event_type': self.pick('event_types')
+        }
+
+    def moment(self, day):
+        return datetime.combine(day, datetime.min.time()) + timedelta(seconds=self.rng.randrange(86400))
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(DESCRIPTION_WORDS, k=words)).capitalize() + '.'
+
+    def entries(self, n, first_id):
+        for i in range(n):
+            day, fields = self.common_fields()
+            yield {
+                'id': str(first_id + i),
+                'date': day.isoformat(),
+                **fields,
+                'who_input': f'analyst{self.rng.randrange(25)}',
+                'when_input': self.moment(day),
+                'details': self.text(self.rng.randint(5, 30)),
+                'entry_date': day,
+                'year_month': year_month(day)
+            }
+
+    def events(self, n):
+        for i in range(n):
+            day, fields = self.common_fields()
+            yield {
+                'event_name': f"{fields['event_type']} in {fields['origin_country']} #{i + 1}",
+                **fields,
+                'year': str(day.year),
+                'description': self.text(self.rng.randint(10, 60)),
+                'created_at': self.moment(day)
+            }
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def ensure_dropdowns(server):
+    """Dropdown values by table, filling empty tables with the defaults"""
+    dropdowns = {}
+    for table, values in DEFAULT_DROPDOWNS.items():
+        existing = server.load_dropdown_values(table)
+        if not existing:
+            rows = [{'value': value, 'order_index': i} for i, value in enumerate(values)]
+            if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+                with server.get_db().begin() as conn:
+                    conn.execute(insert(server.metadata.tables[table]), rows)
+            else:
+                server.csv_table(server.DROPDOWN_CSV_KEYS[table]).append_many(rows)
+            existing = list(values)
+            server.dropdown_sets.replace(table, existing)
+            versions.bump('dropdowns')
+        dropdowns[table] = existing
+    return dropdowns
+
+def write_rows(server, table, rows):
+    """Bulk-write generated rows, bypassing validation and per-row RETURNING"""
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        with server.get_db().begin() as conn:
+            conn.execute(insert(server.metadata.tables[table]), rows)
+    else:
+        rows = [{name: value.isoformat() if isinstance(value, date) else value for name, value in row.items()}
+                for row in rows]
+        csv = server.csv_table(server.EXPORT_TABLES[table])
+        if isinstance(csv, PartitionedCsvTable):
+            # Seeding may fill archived years, so write partitions directly
+            by_year = {}
+            for row in rows:
+                by_year.setdefault(csv.partition_key(row), []).append(row)
+            for year, year_rows in by_year.items():
+                csv.partition(year).append_many(year_rows)
+        else:
+            csv.append_many(rows)
+    versions.bump(table)
+
+def stored_max_entry_id(server):
+    """Highest numeric entry id already stored, or 0"""
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        with server.get_db().connect() as conn:
+            ids = [row[0] for row in conn.execution_options(stream_results=True).execute(text('SELECT id FROM entries'))]
+    else:
+        ids = (row['id'] for row in server.csv_table('data_path'))
+    return max((int(entry_id) for entry_id in ids if entry_id and str(entry_id).isdigit()), default=0)
+
+def seed(server, entries=0, events=0, first_year=None, last_year=None, seed=0, skew=1.1, batch_size=10000, log=None):
+    """Generate and write `entries` and `events` rows through an imported server module.
+
+    Returns the rows written and seconds taken per table, and the first
+    generated entry id (the others follow it).
+    """
+    last_year = last_year or date.today().year
+    first_year = first_year or last_year - 4
+    generator = Generator(ensure_dropdowns(server), first_year, last_year, seed, skew)
+    report = {}
+
+    started = time.perf_counter()
+    written = 0
+    # Entry ids are creation times in milliseconds. Generated ones end now,
+    # or follow the stored ones when an earlier run reached past that, and
+    # the server continues after them
+    first_id = max(int(time.time() * 1000) - entries, stored_max_entry_id(server) + 1)
+    if entries:
+        server.advance_entry_ids(first_id + entries - 1)
+    for rows in batches(generator.entries(entries, first_id), batch_size):
+        write_rows(server, 'entries', rows)
+        written += len(rows)
+        if log:
+            log(f'entries: {written}/{entries}')
+    report['entries'] = {'rows': written, 'seconds': round(time.perf_counter() - started, 3), 'first_id': first_id}
+
+    started = time.perf_counter()
+    written = 0
+    next_id = 1
+    if Config.STORAGE_TYPE == 'csv':
+        next_id = server.reserve_event_ids(events)
+    for rows in batches(generator.events(events), batch_size):
+        if Config.STORAGE_TYPE == 'csv':
+            rows = [{**row, 'id': next_id + i} for i, row in enumerate(rows)]
+            next_id += len(rows)
+        write_rows(server, 'events', rows)
+        written += len(rows)
+        if log:
+            log(f'events: {written}/{events}')
+    report['events'] = {'rows': written, 'seconds': round(time.perf_counter() - started, 3)}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=10000, help='entries to generate (default: 10000)')
+    parser.add_argument('--events', type=int, default=10000, help='events to generate (default: 10000)')
+    parser.add_argument('--first-year', type=int, help='earliest year (default: four years ago)')
+    parser.add_argument('--last-year', type=int, help='latest year (default: this year)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of dropdown popularity (default: 1.1)')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows per write (default: 10000)')
+    args = parser.parse_args()
+
+    import server
+    report = seed(server, args.entries, args.events, args.first_year, args.last_year,
+                  args.seed, args.skew, args.batch_size, log=lambda message: print(message, file=sys.stderr))
+    for table, result in report.items():
+        print(f"{table}: {result['rows']} rows in {result['seconds']}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
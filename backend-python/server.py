@@ -1,119 +1,388 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-import pandas as pd
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from functools import wraps
+import hashlib
+import json
 import os
+import threading
 from pathlib import Path
-from sqlalchemy import text
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.exc import DBAPIError
 
 from config import Config
-from db import initialize_db, get_db, close_db
+from db import initialize_db, get_db, get_read_db, mark_write, read_from_replica, close_db, metadata
+from csv_store import CsvTable, SCHEMAS
+from write_queue import GroupCommitQueue
+from single_flight import SingleFlight
+from result_cache import ResultCache
+from entry_dates import date_columns, csv_date_index, with_date_columns, parse_entry_date, year_month
+from partitions import PartitionedCsvTable, CSV_PARTITIONING, first_hot_year, readonly_partition_error
+from pivot import PIVOT_DIMENSIONS, dense_matrix, csv_encoded_columns
+from export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, export_chunks, parse_timestamp
+from backup import BackupScheduler
+from admission import AdmissionController
+from validation import DropdownSets, compile_validator, ENTRY_FIELDS, EVENT_FIELDS
+import importlib.util
+import versions
 from utils.errors import NotFoundError, ValidationError, handle_error, async_handler
 
 app = Flask(__name__)
 CORS(app)
 
+# Full-table reads and exports; every other route is light
+HEAVY_ENDPOINTS = ['get_entries', 'get_events', 'events_pivot', 'export_table']
+
+admission = None
+if Config.ADMISSION['enabled']:
+    admission = AdmissionController(
+        HEAVY_ENDPOINTS,
+        heavy=Config.ADMISSION['heavy'],
+        light=Config.ADMISSION['light'],
+        rate=Config.ADMISSION['rate'],
+        burst=Config.ADMISSION['burst']
+    ).install(app)
+
 # Initialize database if using PostgreSQL or SQLite
 if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
     initialize_db()
 
-def read_csv(file_path):
-    """Read CSV file and return as list of dictionaries."""
-    if not os.path.exists(file_path):
-        # Create empty CSV if it doesn't exist
-        pd.DataFrame(columns=['value', 'order_index']).to_csv(file_path, index=False)
-    return pd.read_csv(file_path).to_dict('records')
-
-def write_csv(file_path, data):
-    """Write data to CSV file."""
-    df = pd.DataFrame(data)
-    df.to_csv(file_path, index=False)
+def csv_table(key):
+    """CSV table for a Config.CSV key, typed by its declared schema."""
+    if Config.PARTITIONING['enabled'] and key in CSV_PARTITIONING:
+        partition_key, sort_key = CSV_PARTITIONING[key]
+        return PartitionedCsvTable(Config.CSV[key], SCHEMAS[key], partition_key, sort_key,
+                                   first_hot_year(Config.PARTITIONING['hot_years']))
+    return CsvTable(Config.CSV[key], SCHEMAS[key])
+
+def csv_partitions(key, first_year=None, last_year=None):
+    """The files of a CSV table that can hold rows from the given years."""
+    table = csv_table(key)
+    if isinstance(table, PartitionedCsvTable):
+        return table.partitions(first_year, last_year)
+    return [table]
+
+backup_scheduler = None
+if Config.STORAGE_TYPE in ['sqlite', 'csv'] and Config.BACKUP['interval_s'] > 0:
+    backup_scheduler = BackupScheduler(Config.BACKUP['interval_s']).start()
+
+# Cold CSV partitions are compacted once, when their year leaves the hot window
+if Config.STORAGE_TYPE == 'csv' and Config.PARTITIONING['enabled']:
+    for key in CSV_PARTITIONING:
+        csv_table(key).compact()
+
+# Config.CSV key of each dropdown table
+DROPDOWN_CSV_KEYS = {
+    'countries': 'countries_path',
+    'exchanges': 'exchanges_path',
+    'event_types': 'event_types_path'
+}
+
+def load_dropdown_values(table):
+    """All values of a dropdown table, read from the primary."""
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        with get_db().connect() as conn:
+            return [row.value for row in conn.execute(text(f'SELECT value FROM {table}'))]
+    return [row['value'] for row in csv_table(DROPDOWN_CSV_KEYS[table])]
+
+dropdown_sets = DropdownSets(load_dropdown_values)
+validate_entry = compile_validator(ENTRY_FIELDS, dropdown_sets)
+validate_event = compile_validator(EVENT_FIELDS, dropdown_sets)
+
+def stream_json(rows):
+    """Serialize rows as a JSON array, one row at a time."""
+    yield '['
+    for i, row in enumerate(rows):
+        yield (',' if i else '') + json.dumps(row)
+    yield ']'
+
+read_flights = SingleFlight()
+
+# Serialized GET results, keyed like coalesced reads
+result_cache = None
+if Config.RESULT_CACHE['max_mb'] > 0:
+    result_cache = ResultCache(int(Config.RESULT_CACHE['max_mb'] * 1024 * 1024), Config.RESULT_CACHE['ttl_s'])
+
+def normalized_args(params):
+    """The listed query parameters, with repeated values sorted and empty ones dropped"""
+    return tuple(
+        (name, tuple(sorted(values)))
+        for name in params
+        if (values := [value for value in request.args.getlist(name) if value])
+    )
+
+def coalesce(*tables, params=()):
+    """Cache GET results and share one execution between identical concurrent GETs.
+
+    Requests are keyed by path, the normalized values of the query
+    parameters in `params` (others do not affect the result) and the data
+    versions of `tables`. A cached body for the key is returned without
+    touching storage. Otherwise the first request runs the query, requests
+    arriving meanwhile wait for it and reuse its serialized body, and a
+    successful result is cached if no write happened while it was read.
+    A result read from a lagging replica could predate the last write, so
+    it is only cached when entries expire (RESULT_CACHE_TTL > 0). Every
+    result is sent with an ETag (see conditional_response).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            data_versions = versions.current(*tables)
+            key = (request.path, normalized_args(params), data_versions)
+            if result_cache:
+                cached = result_cache.get(key)
+                if cached is not None:
+                    return conditional_response(*cached)
+
+            def execute():
+                response = app.make_response(f(*args, **kwargs))
+                body = response.get_data()
+                result = body, response.status_code, response.mimetype, hashlib.sha256(body).hexdigest()[:32]
+                if result_cache and response.status_code == 200 and versions.current(*tables) == data_versions \
+                        and (result_cache.ttl > 0 or not read_from_replica()):
+                    result_cache.put(key, result, len(body), tables)
+                return result
+
+            return conditional_response(*read_flights.do(key, execute))
+        return decorated
+    return decorator
+
+def conditional_response(body, status, mimetype, etag):
+    """Response carrying an ETag derived from its body.
+
+    The tag depends only on the content, so it stays valid across
+    processes and restarts; a request whose If-None-Match matches gets
+    304 Not Modified without the body.
+    """
+    response = Response(body, status=status, mimetype=mimetype)
+    if status == 200:
+        response.set_etag(etag)
+        response.make_conditional(request)
+    return response
+
+def writes(table):
+    """Bump the table's data version around a write route.
+
+    The version changes before the write starts, so reads already in flight
+    are not shared with requests that should see the write, and again after
+    it finishes, so reads that overlapped the write are not shared either.
+    Cached results read from the table are dropped once the write is done.
+    A write rejected by a read-only PostgreSQL partition is reported as a
+    409, as in CSV mode.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            versions.bump(table)
+            try:
+                return f(*args, **kwargs)
+            except DBAPIError as e:
+                raise readonly_partition_error(e) or e
+            finally:
+                versions.bump(table)
+                if result_cache:
+                    result_cache.invalidate(table)
+        return decorated
+    return decorator
+
+def parse_date_param(name):
+    """Optional ISO date query parameter"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError(f"Invalid '{name}' date, expected YYYY-MM-DD: {value}")
+
+def insert_entries(rows):
+    """Insert entries in one transaction, or one file append in CSV mode."""
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        query = text("""
+            INSERT INTO entries (id, date, month, origin_country, main_impact_country,
+            relevant_exchange, event_type, who_input, when_input, details,
+            entry_date, year_month)
+            VALUES (:id, :date, :month, :origin_country, :main_impact_country,
+            :relevant_exchange, :event_type, :who_input, :when_input, :details,
+            :entry_date, :year_month)
+            RETURNING *
+        """)
+        with get_db().begin() as conn:
+            return [dict(conn.execute(query, row).first()._mapping) for row in rows]
+    return csv_table('data_path').append_many(rows)
+
+def insert_events(rows):
+    """Insert events in one transaction, or one file append in CSV mode."""
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        query = text("""
+            INSERT INTO events 
+            (event_name, event_type, origin_country, main_impact_country,
+             relevant_exchange, month, year, description, created_at)
+            VALUES (:event_name, :event_type, :origin_country, :main_impact_country,
+                    :relevant_exchange, :month, :year, :description, :created_at)
+            RETURNING *
+        """)
+        with get_db().begin() as conn:
+            return [dict(conn.execute(query, row).first()._mapping) for row in rows]
+    # Held until the rows are appended, so concurrent inserts get distinct
+    # ids and write them in order
+    with _event_id_lock:
+        next_id = reserve_event_ids(len(rows))
+        return csv_table('events_path').append_many([
+            {**row, 'id': next_id + i, 'created_at': row['created_at'].isoformat()}
+            for i, row in enumerate(rows)
+        ])
+
+_event_id_lock = threading.RLock()
+_last_event_id = None
+
+def reserve_event_ids(count):
+    """First of `count` consecutive new event ids in CSV mode.
+
+    The highest stored id is read from the files once and then kept in
+    memory, so inserts do not scan every events file.
+    """
+    global _last_event_id
+    with _event_id_lock:
+        if _last_event_id is None:
+            _last_event_id = max((event['id'] or 0 for event in csv_table('events_path')), default=0)
+        first_id = _last_event_id + 1
+        _last_event_id += count
+        return first_id
+
+INSERTERS = {
+    'entries': insert_entries,
+    'events': insert_events
+}
+
+# With group commit, concurrent inserts into a table are flushed together
+write_queues = {}
+if Config.GROUP_COMMIT['enabled']:
+    write_queues = {
+        table: GroupCommitQueue(
+            inserter,
+            max_batch=Config.GROUP_COMMIT['max_batch'],
+            max_delay=Config.GROUP_COMMIT['max_delay_ms'] / 1000,
+            name=f'group-commit-{table}'
+        )
+        for table, inserter in INSERTERS.items()
+    }
+
+def insert_row(table, row):
+    """Insert one row and return it as stored, once it is durable."""
+    if table in write_queues:
+        # The flush runs outside this request, so record the write here
+        mark_write()
+        return write_queues[table].submit(row)
+    return INSERTERS[table]([row])[0]
+
+_entry_id_lock = threading.Lock()
+_last_entry_id = 0
+
+def next_entry_id():
+    """Entry ids are creation times in milliseconds, bumped past the last one
+    so entries created within the same millisecond do not collide."""
+    global _last_entry_id
+    with _entry_id_lock:
+        _last_entry_id = max(int(datetime.now().timestamp() * 1000), _last_entry_id + 1)
+        return str(_last_entry_id)
+
+def advance_entry_ids(last_id):
+    """Make next_entry_id() continue after `last_id`, e.g. after a bulk load"""
+    global _last_entry_id
+    with _entry_id_lock:
+        _last_entry_id = max(_last_entry_id, last_id)
 
 @app.route('/entries', methods=['GET'])
 @async_handler
+@coalesce('entries', params=('from', 'to'))
 def get_entries():
+    start = parse_date_param('from')
+    end = parse_date_param('to')
+    dated = start is not None or end is not None
+
     if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
-        db = get_db()
+        db = get_read_db()
         with db.connect() as conn:
-            result = conn.execute(text('SELECT * FROM entries ORDER BY when_input DESC'))
-            entries = [dict(row) for row in result]
+            if dated:
+                # Range scan on the entry_date index
+                bounds = {'start': start, 'end': end}
+                conditions = [f'entry_date {op} :{name}'
+                              for name, op in [('start', '>='), ('end', '<=')] if bounds[name]]
+                result = conn.execute(
+                    text(f"SELECT * FROM entries WHERE {' AND '.join(conditions)} ORDER BY entry_date ASC"),
+                    {name: value.isoformat() for name, value in bounds.items() if value}
+                )
+            else:
+                result = conn.execute(text('SELECT * FROM entries ORDER BY when_input DESC'))
+            entries = [dict(row._mapping) for row in result]
         return jsonify(entries)
+    elif dated:
+        # Partitions are in year order, so their ranges concatenate in date order
+        return jsonify([
+            entry
+            for partition in csv_partitions('data_path', start and start.year, end and end.year)
+            for entry in csv_date_index(partition).between(start, end)
+        ])
     else:
-        entries = read_csv(Config.CSV['data_path'])
-        return jsonify(entries)
+        entries = map(with_date_columns, csv_table('data_path'))
+        return Response(stream_json(entries), mimetype='application/json')
 
 @app.route('/entries', methods=['POST'])
 @async_handler
+@writes('entries')
 def create_entry():
-    data = request.json
-    required_fields = ['date', 'month', 'origin_country', 'main_impact_country',
-                      'relevant_exchange', 'event_type', 'who_input', 'when_input', 'details']
-    
-    missing_fields = [field for field in required_fields if field not in data]
-    if missing_fields:
-        raise ValidationError(f"Missing required fields: {', '.join(missing_fields)}")
+    data = validate_entry(request.json)
 
-    entry_id = str(int(datetime.now().timestamp() * 1000))
-    new_entry = {**data, 'id': entry_id}
+    # An unreadable date is kept as entered, with NULL entry_date and year_month
+    entry_id = next_entry_id()
+    new_entry = {**data, **date_columns(data['date']), 'id': entry_id}
 
-    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
-        db = get_db()
-        with db.connect() as conn:
-            query = text("""
-                INSERT INTO entries (id, date, month, origin_country, main_impact_country,
-                relevant_exchange, event_type, who_input, when_input, details)
-                VALUES (:id, :date, :month, :origin_country, :main_impact_country,
-                :relevant_exchange, :event_type, :who_input, :when_input, :details)
-                RETURNING *
-            """)
-            result = conn.execute(query, new_entry)
-            entry = dict(result.first())
-        return jsonify(entry)
-    else:
-        entries = read_csv(Config.CSV['data_path'])
-        entries.append(new_entry)
-        write_csv(Config.CSV['data_path'], entries)
-        return jsonify(new_entry)
+    entry = insert_row('entries', new_entry)
+    if Config.STORAGE_TYPE == 'csv':
+        entry = with_date_columns(entry)
+    return jsonify(entry)
 
 @app.route('/entries/<entry_id>', methods=['PUT'])
 @async_handler
+@writes('entries')
 def update_entry(entry_id):
-    data = request.json
+    # CSV rows are merged with the changes; SQL updates set every column
+    data = validate_entry(request.json, partial=Config.STORAGE_TYPE == 'csv')
+    normalized = date_columns(data.get('date'))
 
     if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
         db = get_db()
-        with db.connect() as conn:
+        with db.begin() as conn:
             query = text("""
                 UPDATE entries SET
                 date = :date, month = :month, origin_country = :origin_country,
                 main_impact_country = :main_impact_country, relevant_exchange = :relevant_exchange,
                 event_type = :event_type, who_input = :who_input, when_input = :when_input,
-                details = :details
+                details = :details, entry_date = :entry_date, year_month = :year_month
                 WHERE id = :id RETURNING *
             """)
-            result = conn.execute(query, {**data, 'id': entry_id})
+            result = conn.execute(query, {**data, **normalized, 'id': entry_id})
             entry = result.first()
             
             if not entry:
                 raise NotFoundError('Entry not found')
-            return jsonify(dict(entry))
+            return jsonify(dict(entry._mapping))
     else:
-        entries = read_csv(Config.CSV['data_path'])
-        entry_index = next((i for i, e in enumerate(entries) if str(e['id']) == entry_id), None)
+        entry = csv_table('data_path').update('id', entry_id, data)
         
-        if entry_index is None:
+        if entry is None:
             raise NotFoundError('Entry not found')
             
-        entries[entry_index] = {**entries[entry_index], **data}
-        write_csv(Config.CSV['data_path'], entries)
-        return jsonify(entries[entry_index])
+        return jsonify(with_date_columns(entry))
 
 @app.route('/entries/<entry_id>', methods=['DELETE'])
 @async_handler
+@writes('entries')
 def delete_entry(entry_id):
     if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
         db = get_db()
-        with db.connect() as conn:
+        with db.begin() as conn:
             result = conn.execute(
                 text('DELETE FROM entries WHERE id = :id RETURNING *'),
                 {'id': entry_id}
@@ -121,29 +390,25 @@ def delete_entry(entry_id):
             if not result.first():
                 raise NotFoundError('Entry not found')
     else:
-        entries = read_csv(Config.CSV['data_path'])
-        new_entries = [e for e in entries if str(e['id']) != entry_id]
-        
-        if len(new_entries) == len(entries):
+        if not csv_table('data_path').delete('id', entry_id):
             raise NotFoundError('Entry not found')
-            
-        write_csv(Config.CSV['data_path'], new_entries)
     
     return jsonify({'success': True})
 
 @app.route('/dropdowns', methods=['GET'])
 @async_handler
+@coalesce('dropdowns')
 def get_dropdowns():
     if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
-        db = get_db()
+        db = get_read_db()
         with db.connect() as conn:
-            countries = [row['value'] for row in conn.execute(text('SELECT value FROM countries ORDER BY order_index ASC'))]
-            exchanges = [row['value'] for row in conn.execute(text('SELECT value FROM exchanges ORDER BY order_index ASC'))]
-            event_types = [row['value'] for row in conn.execute(text('SELECT value FROM event_types ORDER BY order_index ASC'))]
+            countries = [row.value for row in conn.execute(text('SELECT value FROM countries ORDER BY order_index ASC'))]
+            exchanges = [row.value for row in conn.execute(text('SELECT value FROM exchanges ORDER BY order_index ASC'))]
+            event_types = [row.value for row in conn.execute(text('SELECT value FROM event_types ORDER BY order_index ASC'))]
     else:
-        countries = sorted(read_csv(Config.CSV['countries_path']), key=lambda x: x.get('order_index', 0))
-        exchanges = sorted(read_csv(Config.CSV['exchanges_path']), key=lambda x: x.get('order_index', 0))
-        event_types = sorted(read_csv(Config.CSV['event_types_path']), key=lambda x: x.get('order_index', 0))
+        countries = sorted(csv_table('countries_path'), key=lambda x: x['order_index'] or 0)
+        exchanges = sorted(csv_table('exchanges_path'), key=lambda x: x['order_index'] or 0)
+        event_types = sorted(csv_table('event_types_path'), key=lambda x: x['order_index'] or 0)
         
         countries = [c['value'] for c in countries]
         exchanges = [e['value'] for e in exchanges]
@@ -158,6 +423,7 @@ def get_dropdowns():
 
 @app.route('/dropdowns/<key>', methods=['POST'])
 @async_handler
+@writes('dropdowns')
 def add_dropdown_value(key):
     value = request.json.get('value')
     if not value:
@@ -165,19 +431,19 @@ def add_dropdown_value(key):
 
     if key in ['origin_country', 'main_impact_country']:
         table = 'countries'
-        file_path = Config.CSV['countries_path']
+        csv_key = 'countries_path'
     elif key == 'relevant_exchange':
         table = 'exchanges'
-        file_path = Config.CSV['exchanges_path']
+        csv_key = 'exchanges_path'
     elif key == 'event_type':
         table = 'event_types'
-        file_path = Config.CSV['event_types_path']
+        csv_key = 'event_types_path'
     else:
         raise ValidationError('Invalid dropdown key')
 
     if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
         db = get_db()
-        with db.connect() as conn:
+        with db.begin() as conn:
             # Get max order_index
             result = conn.execute(text(f'SELECT COALESCE(MAX(order_index), -1) as max_order FROM {table}'))
             next_order = result.scalar() + 1
@@ -190,19 +456,21 @@ def add_dropdown_value(key):
             
             # Get updated values
             result = conn.execute(text(f'SELECT value FROM {table} ORDER BY order_index ASC'))
-            values = [row['value'] for row in result]
+            values = [row.value for row in result]
     else:
-        data = read_csv(file_path)
+        dropdown = csv_table(csv_key)
+        data = dropdown.read_all()
         if not any(row['value'] == value for row in data):
-            max_order = max([-1] + [row.get('order_index', 0) for row in data])
-            data.append({'value': value, 'order_index': max_order + 1})
-            write_csv(file_path, data)
-        values = [row['value'] for row in sorted(data, key=lambda x: x.get('order_index', 0))]
+            max_order = max([-1] + [row['order_index'] or 0 for row in data])
+            data.append(dropdown.append({'value': value, 'order_index': max_order + 1}))
+        values = [row['value'] for row in sorted(data, key=lambda x: x['order_index'] or 0)]
 
+    dropdown_sets.replace(table, values)
     return jsonify(values)
 
 @app.route('/dropdowns/<key>', methods=['DELETE'])
 @async_handler
+@writes('dropdowns')
 def delete_dropdown_value(key):
     value = request.json.get('value')
     if not value:
@@ -210,19 +478,19 @@ def delete_dropdown_value(key):
 
     if key in ['origin_country', 'main_impact_country']:
         table = 'countries'
-        file_path = Config.CSV['countries_path']
+        csv_key = 'countries_path'
     elif key == 'relevant_exchange':
         table = 'exchanges'
-        file_path = Config.CSV['exchanges_path']
+        csv_key = 'exchanges_path'
     elif key == 'event_type':
         table = 'event_types'
-        file_path = Config.CSV['event_types_path']
+        csv_key = 'event_types_path'
     else:
         raise ValidationError('Invalid dropdown key')
 
     if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
         db = get_db()
-        with db.connect() as conn:
+        with db.begin() as conn:
             result = conn.execute(
                 text(f'DELETE FROM {table} WHERE value = :value RETURNING *'),
                 {'value': value}
@@ -231,33 +499,32 @@ def delete_dropdown_value(key):
                 raise NotFoundError('Value not found')
             
             result = conn.execute(text(f'SELECT value FROM {table} ORDER BY order_index ASC'))
-            values = [row['value'] for row in result]
+            values = [row.value for row in result]
     else:
-        data = read_csv(file_path)
-        new_data = [row for row in data if row['value'] != value]
-        
-        if len(new_data) == len(data):
+        dropdown = csv_table(csv_key)
+        if not dropdown.delete('value', value):
             raise NotFoundError('Value not found')
             
-        write_csv(file_path, new_data)
-        values = [row['value'] for row in sorted(new_data, key=lambda x: x.get('order_index', 0))]
+        values = [row['value'] for row in sorted(dropdown, key=lambda x: x['order_index'] or 0)]
 
+    dropdown_sets.replace(table, values)
     return jsonify(values)
 
 @app.route('/dropdowns/<key>/reorder', methods=['PUT'])
 @async_handler
+@writes('dropdowns')
 def reorder_dropdown_values(key):
     values = request.json.get('values', [])
     
     if key in ['origin_country', 'main_impact_country']:
         table = 'countries'
-        file_path = Config.CSV['countries_path']
+        csv_key = 'countries_path'
     elif key == 'relevant_exchange':
         table = 'exchanges'
-        file_path = Config.CSV['exchanges_path']
+        csv_key = 'exchanges_path'
     elif key == 'event_type':
         table = 'event_types'
-        file_path = Config.CSV['event_types_path']
+        csv_key = 'event_types_path'
     else:
         raise ValidationError('Invalid dropdown key')
 
@@ -277,64 +544,206 @@ def reorder_dropdown_values(key):
                 trans.rollback()
                 raise
     else:
-        data = read_csv(file_path)
         new_data = [{'value': value, 'order_index': i} for i, value in enumerate(values)]
-        write_csv(file_path, new_data)
+        csv_table(csv_key).write_all(new_data)
+        # The file now holds exactly the listed values
+        dropdown_sets.replace(table, values)
 
     return jsonify(values)
 
 @app.route('/events', methods=['POST'])
 @async_handler
+@writes('events')
 def create_event():
-    data = request.json
-    required_fields = ['event_name', 'event_type', 'origin_country', 'main_impact_country',
-                      'relevant_exchange', 'month', 'year', 'description']
-    
-    missing_fields = [field for field in required_fields if field not in data]
-    if missing_fields:
-        raise ValidationError(f"Missing required fields: {', '.join(missing_fields)}")
+    data = validate_event(request.json)
 
-    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
-        db = get_db()
-        with db.connect() as conn:
-            result = conn.execute(
-                text("""
-                    INSERT INTO events 
-                    (event_name, event_type, origin_country, main_impact_country,
-                     relevant_exchange, month, year, description, created_at)
-                    VALUES (:event_name, :event_type, :origin_country, :main_impact_country,
-                            :relevant_exchange, :month, :year, :description, :created_at)
-                    RETURNING *
-                """),
-                {**data, 'created_at': datetime.utcnow()}
-            )
-            event = dict(result.first())
-        return jsonify(event)
-    else:
-        events = read_csv(Config.CSV['events_path'])
-        new_event = {
-            'id': len(events) + 1,
-            **data,
-            'created_at': datetime.utcnow().isoformat()
-        }
-        events.append(new_event)
-        write_csv(Config.CSV['events_path'], events)
-        return jsonify(new_event)
+    return jsonify(insert_row('events', {**data, 'created_at': datetime.utcnow()}))
 
 @app.route('/events', methods=['GET'])
 @async_handler
+@coalesce('events', params=('year',))
 def get_events():
+    years = request.args.getlist('year')
+    if not all(year.isdigit() for year in years):
+        raise ValidationError('year must be a number')
+
     if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
-        db = get_db()
+        db = get_read_db()
         with db.connect() as conn:
-            result = conn.execute(text('SELECT * FROM events ORDER BY created_at DESC'))
-            events = [dict(row) for row in result]
+            if years:
+                # Only the listed years' partitions are scanned
+                params = {f'year{i}': year for i, year in enumerate(years)}
+                query = f"SELECT * FROM events WHERE year IN ({', '.join(':' + name for name in params)}) ORDER BY created_at DESC"
+                result = conn.execute(text(query), params)
+            else:
+                result = conn.execute(text('SELECT * FROM events ORDER BY created_at DESC'))
+            events = [dict(row._mapping) for row in result]
         return jsonify(events)
     else:
-        events = read_csv(Config.CSV['events_path'])
-        events.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        if years:
+            events = [
+                event
+                for year in sorted(set(years))
+                for partition in csv_partitions('events_path', int(year), int(year))
+                for event in partition
+                if str(event['year']).strip() == year
+            ]
+        else:
+            events = csv_table('events_path')
+        events = sorted(events, key=lambda x: x['created_at'] or '', reverse=True)
         return jsonify(events)
 
+@app.route('/events/pivot', methods=['GET'])
+@async_handler
+@coalesce('events', params=('rows', 'cols', *PIVOT_DIMENSIONS))
+def events_pivot():
+    """Event counts for every pair of values of two columns, as a dense matrix."""
+    rows = request.args.get('rows')
+    cols = request.args.get('cols')
+    if rows not in PIVOT_DIMENSIONS or cols not in PIVOT_DIMENSIONS or rows == cols:
+        raise ValidationError(f"rows and cols must be two different columns of: {', '.join(PIVOT_DIMENSIONS)}")
+    filters = {
+        column: values
+        for column in PIVOT_DIMENSIONS
+        if (values := [value for value in request.args.getlist(column) if value])
+    }
+
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        params = {}
+        conditions = [f'{rows} IS NOT NULL', f'{cols} IS NOT NULL']
+        for column, values in filters.items():
+            names = [f'{column}{i}' for i in range(len(values))]
+            params.update(zip(names, values))
+            conditions.append(f"{column} IN ({', '.join(':' + name for name in names)})")
+        with get_read_db().connect() as conn:
+            result = conn.execute(text(
+                f"SELECT {rows} AS row_label, {cols} AS col_label, COUNT(*) AS n FROM events "
+                f"WHERE {' AND '.join(conditions)} GROUP BY {rows}, {cols}"
+            ), params)
+            counts = {(str(row.row_label), str(row.col_label)): row.n for row in result}
+    else:
+        years = [int(year) for year in filters.get('year', []) if year.isdigit()]
+        partitions = csv_partitions('events_path', min(years), max(years)) if years else csv_partitions('events_path')
+        counts = {}
+        for partition in partitions:
+            for pair, n in csv_encoded_columns(partition).counts(rows, cols, filters).items():
+                counts[pair] = counts.get(pair, 0) + n
+
+    return jsonify(dense_matrix(counts, rows, cols))
+
+# Exportable tables, with their Config.CSV key
+EXPORT_TABLES = {
+    'entries': 'data_path',
+    'events': 'events_path'
+}
+
+def parse_filter_value(python_type, value):
+    """Convert a query parameter to a column's type"""
+    if python_type is datetime:
+        parsed = parse_timestamp(value)
+        if parsed is None:
+            raise ValueError(f'not an ISO 8601 timestamp: {value}')
+        return parsed
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+def sql_filter(db, column, values):
+    """Clause matching any of `values`; timestamps match to the second"""
+    if column.type.python_type is not datetime:
+        return column.in_(values)
+    if db.dialect.name == 'sqlite':
+        # Timestamps are kept as the text they were written with ('T' or
+        # space, 'Z', offsets); datetime() reads them all as UTC seconds
+        return func.datetime(column).in_([value.isoformat(' ') for value in values])
+    return or_(*[and_(column >= value, column < value + timedelta(seconds=1)) for value in values])
+
+def csv_export_rows(table):
+    """A CSV table's rows with the columns its SQL table has"""
+    for row in csv_table(EXPORT_TABLES[table]):
+        if table == 'entries':
+            day = parse_entry_date(row['date'])
+            row = {**row, 'entry_date': day, 'year_month': year_month(day)}
+        yield row
+
+@app.route('/export/<table>', methods=['GET'])
+@async_handler
+def export_table(table):
+    if table not in EXPORT_TABLES:
+        raise NotFoundError(f'Unknown table: {table}')
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        raise ValidationError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise ValidationError('Parquet export requires pyarrow to be installed')
+
+    # Both modes expose the SQL columns, and filters are parsed by their SQL types
+    db_table = metadata.tables[table]
+    filter_types = {column.name: column.type.python_type for column in db_table.columns}
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        types = filter_types
+    else:
+        # CSV cells are written as stored; only the derived entry_date is typed
+        types = {**SCHEMAS[EXPORT_TABLES[table]], 'entry_date': date, 'year_month': str}
+        types = {name: types[name] for name in filter_types}
+
+    columns = [name for name in request.args.get('columns', '').split(',') if name] or list(types)
+    unknown = [name for name in columns if name not in types]
+    if unknown:
+        raise ValidationError(f"Unknown columns: {', '.join(unknown)}")
+    # Any other parameter named after a column filters on it; repeat it to accept several values
+    try:
+        filters = {
+            name: [parse_filter_value(filter_types[name], value) for value in request.args.getlist(name)]
+            for name in request.args if name in filter_types
+        }
+    except ValueError as e:
+        raise ValidationError(f'Invalid filter value: {e}')
+
+    if Config.STORAGE_TYPE in ['postgres', 'sqlite']:
+        db = get_read_db()
+        query = select(*[db_table.c[name] for name in columns]).where(
+            *[sql_filter(db, db_table.c[name], values) for name, values in filters.items()]
+        )
+
+        def rows():
+            # A server-side cursor, so only one chunk is held at a time
+            with db.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS).execute(query)
+                for row in result:
+                    yield row._mapping
+    else:
+        # Timestamps are stored as text, so they are compared once parsed
+        cell = {name: parse_timestamp if filter_types[name] is datetime else (lambda value: value)
+                for name in filters}
+
+        def rows():
+            for row in csv_export_rows(table):
+                if all(cell[name](row[name]) in values for name, values in filters.items()):
+                    yield row
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    return Response(
+        export_chunks(rows(), columns, types, fmt),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={table}.{extension}'}
+    )
+
+@app.route('/metrics/coalescing', methods=['GET'])
+def coalescing_metrics():
+    """Counts of shared GET executions and of requests that reused one."""
+    return jsonify(read_flights.metrics())
+
+@app.route('/metrics/cache', methods=['GET'])
+def cache_metrics():
+    """Hits, misses, evictions and memory use of the result cache."""
+    return jsonify(result_cache.metrics() if result_cache else {'enabled': False})
+
+@app.route('/metrics/admission', methods=['GET'])
+def admission_metrics():
+    """Admitted, rejected and waiting requests per route class."""
+    return jsonify(admission.metrics() if admission else {'enabled': False})
+
 @app.route('/')
 def index():
     """Display API documentation."""
@@ -346,7 +755,7 @@ def index():
             <h2>Available Endpoints:</h2>
             <ul>
                 <li><strong>GET /</strong> - This API documentation</li>
-                <li><strong>GET /entries</strong> - Retrieve all entries</li>
+                <li><strong>GET /entries</strong> - Retrieve all entries (optionally ?from=YYYY-MM-DD&amp;to=YYYY-MM-DD)</li>
                 <li><strong>POST /entries</strong> - Create a new entry</li>
                 <li><strong>PUT /entries/:id</strong> - Update an entry by id</li>
                 <li><strong>DELETE /entries/:id</strong> - Delete an entry by id</li>
@@ -355,7 +764,12 @@ def index():
                 <li><strong>DELETE /dropdowns/:key</strong> - Remove a dropdown value for a given key</li>
                 <li><strong>PUT /dropdowns/:key/reorder</strong> - Reorder dropdown values for a given key</li>
                 <li><strong>POST /events</strong> - Create a new event</li>
-                <li><strong>GET /events</strong> - Retrieve all events</li>
+                <li><strong>GET /events</strong> - Retrieve all events (optionally ?year=YYYY, repeatable)</li>
+                <li><strong>GET /export/:table</strong> - Stream entries or events as ?format=csv|ndjson|parquet, with optional ?columns= and column filters</li>
+                <li><strong>GET /events/pivot?rows=&lt;column&gt;&amp;cols=&lt;column&gt;</strong> - Event counts by two columns, as a matrix</li>
+                <li><strong>GET /metrics/coalescing</strong> - Request coalescing counters</li>
+                <li><strong>GET /metrics/cache</strong> - Result cache counters</li>
+                <li><strong>GET /metrics/admission</strong> - Admission control counters</li>
             </ul>
             <p>CSV File paths used:</p>
             <ul>
@@ -373,9 +787,17 @@ def index():
 # Register error handler
 app.register_error_handler(Exception, handle_error)
 
-# Cleanup database connection on server shutdown
+def shutdown():
+    """Flush queued writes, then close the database connection."""
+    if backup_scheduler:
+        backup_scheduler.stop()
+    for write_queue in write_queues.values():
+        write_queue.close()
+    close_db()
+
+# Flush queued writes and clean up on server shutdown
 import atexit
-atexit.register(close_db)
+atexit.register(shutdown)
 
 if __name__ == '__main__':
     # Start the server
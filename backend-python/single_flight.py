@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """Shares one execution between identical concurrent calls.
+
+    The first caller for a key runs the function; callers arriving with the
+    same key while it runs wait for it and get the same result (or
+    exception). Once the call finishes the key is forgotten, so nothing is
+    cached beyond the in-flight window.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Future()
+                self.executions += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return call.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
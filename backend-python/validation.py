@@ -0,0 +1,129 @@
+import threading
+import time
+
+from pivot import MONTHS
+from utils.errors import ValidationError
+
+class DropdownSets:
+    """In-memory frozensets of each dropdown table's values.
+
+    A table is loaded on first use with `loader(table)`. The dropdown routes
+    replace a table's set after changing it. A value that is not in the set
+    triggers one reload (at most every `reload_interval` seconds) before it
+    is rejected, which picks up changes made by other server processes.
+    """
+
+    def __init__(self, loader, reload_interval=1.0):
+        self.loader = loader
+        self.reload_interval = reload_interval
+        self._sets = {}
+        self._loaded_at = {}
+        self._lock = threading.Lock()
+
+    def replace(self, table, values):
+        with self._lock:
+            self._sets[table] = frozenset(values)
+            self._loaded_at[table] = time.monotonic()
+
+    def _load(self, table):
+        self.replace(table, self.loader(table))
+        return self._sets[table]
+
+    def contains(self, table, value):
+        values = self._sets.get(table)
+        if values is None:
+            values = self._load(table)
+        if value in values:
+            return True
+        if time.monotonic() - self._loaded_at.get(table, 0) >= self.reload_interval:
+            return value in self._load(table)
+        return False
+
+def _text(value):
+    return value if isinstance(value, str) else None
+
+def _month(value):
+    """Full English month name, e.g. 'January'"""
+    return value if value in MONTHS else None
+
+def _year(value):
+    """Years are stored as text; accept 2024 or '2024'"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    return value if isinstance(value, str) and len(value) == 4 and value.isdigit() else None
+
+COERCERS = {
+    'text': (_text, 'must be a string'),
+    'note': (_text, 'must be a string or null'),
+    'month': (_month, 'must be a month name'),
+    'year': (_year, 'must be a four-digit year')
+}
+
+# Kinds that also accept null
+NULLABLE = {'note'}
+
+def compile_validator(fields, dropdowns):
+    """Build a validator for a record type.
+
+    `fields` maps each field to (kind, dropdown table or None); every field
+    is required. The returned function takes the request body (and
+    `partial=True` to check only the fields present) and returns the
+    known fields with coerced values, or raises ValidationError listing
+    every problem.
+    """
+    checks = tuple(
+        (name, COERCERS[kind][0], COERCERS[kind][1], table, kind in NULLABLE)
+        for name, (kind, table) in fields.items()
+    )
+    required = tuple(fields)
+
+    def validate(data, partial=False):
+        if not isinstance(data, dict):
+            raise ValidationError('Request body must be a JSON object')
+        if not partial:
+            missing = [name for name in required if name not in data]
+            if missing:
+                raise ValidationError(f"Missing required fields: {', '.join(missing)}")
+        result = {}
+        errors = []
+        for name, coerce, message, table, nullable in checks:
+            if name not in data:
+                continue
+            if nullable and data[name] is None:
+                result[name] = None
+                continue
+            value = coerce(data[name])
+            if value is None:
+                errors.append(f'{name} {message}')
+            elif table and not dropdowns.contains(table, value):
+                errors.append(f"{name} '{value}' is not in {table}")
+            else:
+                result[name] = value
+        if errors:
+            raise ValidationError(f"Invalid fields: {'; '.join(errors)}")
+        return result
+
+    return validate
+
+ENTRY_FIELDS = {
+    'date': ('text', None),
+    'month': ('month', None),
+    'origin_country': ('text', 'countries'),
+    'main_impact_country': ('text', 'countries'),
+    'relevant_exchange': ('text', 'exchanges'),
+    'event_type': ('text', 'event_types'),
+    'who_input': ('text', None),
+    'when_input': ('text', None),
+    'details': ('note', None)
+}
+
+EVENT_FIELDS = {
+    'event_name': ('text', None),
+    'event_type': ('text', 'event_types'),
+    'origin_country': ('text', 'countries'),
+    'main_impact_country': ('text', 'countries'),
+    'relevant_exchange': ('text', 'exchanges'),
+    'month': ('month', None),
+    'year': ('year', None),
+    'description': ('note', None)
+}
@@ -0,0 +1,17 @@
+import threading
+from collections import defaultdict
+
+# Per-table write counters for this process. A cached or shared read is
+# only valid for the versions it was computed at.
+_versions = defaultdict(int)
+_lock = threading.Lock()
+
+def bump(table):
+    """Record a write to `table`"""
+    with _lock:
+        _versions[table] += 1
+
+def current(*tables):
+    """Current versions of `tables`, as a tuple usable in a key"""
+    with _lock:
+        return tuple(_versions[table] for table in tables)
@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class GroupCommitQueue:
+    """Batches concurrent writes into one flush.
+
+    `flush(items)` writes a batch in one transaction (or one file append) and
+    returns one result per item, in order. A single background thread takes
+    the first waiting item, collects more until `max_batch` items are queued
+    or `max_delay` seconds have passed, and flushes them together. Callers of
+    `submit` block until their batch has been flushed, so a returned result
+    is always durable; if the flush fails, every caller in the batch gets the
+    exception.
+    """
+
+    def __init__(self, flush, max_batch=256, max_delay=0.005, name='group-commit'):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._items = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue an item and wait for the result of its flushed batch"""
+        if self._closed:
+            raise RuntimeError('Write queue is closed')
+        future = Future()
+        self._items.put((item, future))
+        return future.result()
+
+    def close(self):
+        """Flush whatever is queued and stop the background thread"""
+        if not self._closed:
+            self._closed = True
+            self._items.put(None)
+            self._thread.join()
+
+    def _collect(self):
+        """Block for the first item, then gather a batch behind it.
+
+        Returns the batch and whether the queue was closed while collecting.
+        """
+        first = self._items.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = self._items.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        closed = False
+        while not closed:
+            batch, closed = self._collect()
+            if closed:
+                # Drain anything queued before close() so no caller hangs
+                while True:
+                    try:
+                        entry = self._items.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is not None:
+                        batch.append(entry)
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            results = self.flush([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from datetime import datetime
-from services import EventService
+from services import EventService, MONTHS, CATEGORY_COLUMNS
+from aggregates import build_charts, build_pivot_charts, build_timeline, pivot_heatmap, pivot_matrix, timeline_window
+from filter_index import FILTER_COLUMNS, build_filter_index
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,9 +25,21 @@ if 'show_edit_form' not in st.session_state:
     st.session_state.show_edit_form = False
 if 'edit_event_id' not in st.session_state:
     st.session_state.edit_event_id = None
+if 'page_cursors' not in st.session_state:
+    st.session_state.page_cursors = [None]
+if 'page_query' not in st.session_state:
+    st.session_state.page_query = None
 
-MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
-          'July', 'August', 'September', 'October', 'November', 'December']
+PAGE_SIZES = [25, 50, 100, 200]
+
+FILTER_LABELS = {
+    'origin_country': "Origin Countries",
+    'main_impact_country': "Impact Countries",
+    'relevant_exchange': "Exchanges",
+    'event_type': "Event Types",
+    'year': "Years",
+    'month': "Months"
+}
 
 def show_event_form(event_data=None):
     """Show form for adding/editing events"""
@@ -93,10 +106,40 @@ def show_event_form(event_data=None):
                     st.session_state.show_add_form = False
                     st.experimental_rerun()
 
+def _event_payload(row, columns):
+    """JSON-ready field values of an editor row"""
+    return {col: None if pd.isna(row[col]) else getattr(row[col], 'item', lambda: row[col])()
+            for col in columns}
+
+def save_table_edits(service, source_df, table_df, edited_df, columns):
+    """Send the editor's changes to the backend; returns whether all succeeded.
+
+    Rows are matched by the index labels st.data_editor keeps from
+    `table_df`, whose events are `source_df`: changed rows are updated,
+    removed rows deleted and added rows created. Stops at the first
+    failed request.
+    """
+    kept = edited_df.index.intersection(table_df.index)
+    current, edited = table_df.loc[kept, columns], edited_df.loc[kept, columns]
+    changed = (current.ne(edited) & ~(current.isna() & edited.isna())).any(axis=1)
+    for label in changed[changed].index:
+        if not service.update_event(int(source_df.at[label, 'id']), _event_payload(edited.loc[label], columns)):
+            return False
+    for label in table_df.index.difference(edited_df.index):
+        if not service.delete_event(int(source_df.at[label, 'id'])):
+            return False
+    for label in edited_df.index.difference(table_df.index):
+        row = edited_df.loc[label]
+        if row[columns].notna().any() and not service.create_event(_event_payload(row, columns)):
+            return False
+    return True
+
 def main():
     st.title("Events Dashboard 📊")
     
     service = st.session_state.event_service
+    if service.stale:
+        st.caption("Showing cached data while refreshing from the backend")
     
     # Create tabs
     tab1, tab2 = st.tabs(["📝 Events Manager", "📊 Analytics"])
@@ -112,58 +155,84 @@ def main():
             st.subheader("Add New Event")
             show_event_form()
         
-        if st.session_state.show_edit_form and st.session_state.edit_event_id is not None:
-            st.subheader("Edit Event")
-            events_df = service.get_events()
-            event_data = events_df[events_df['id'] == st.session_state.edit_event_id].iloc[0].to_dict()
-            show_event_form(event_data)
+        # Filled once the table's events are known, so editing needs no extra fetch
+        edit_container = st.container()
+
+        # In paginated mode the events are never loaded as a whole: the table
+        # fetches the visible page, and filter options and analytics come
+        # from the reference lists and backend aggregates
+        paginated = st.toggle("Paginated table", value=True)
 
         # Filters in a horizontal layout
         st.subheader("Filters")
-        col1, col2, col3, col4 = st.columns(4)
-        
-        filters = {}
-        with col1:
-            # Country filter
-            countries = ["All"] + service.get_countries()
-            selected_country = st.selectbox("Select Origin Country", countries)
-            if selected_country != "All":
-                filters['origin_country'] = selected_country
-        
-        with col2:
-            # Event type filter
-            event_types = ["All"] + service.get_event_types()
-            selected_event_type = st.selectbox("Select Event Type", event_types)
-            if selected_event_type != "All":
-                filters['event_type'] = selected_event_type
-        
-        with col3:
-            # Month filter
-            selected_month = st.selectbox("Select Month", ["All"] + MONTHS)
-            if selected_month != "All":
-                filters['month'] = selected_month
-        
-        with col4:
-            # Year filter
+        if paginated:
+            years = service.get_event_years()
+        else:
             events_df = service.get_events()
-            years = sorted(events_df['year'].unique())
-            selected_year = st.selectbox("Select Year", ["All"] + list(years))
-            if selected_year != "All":
-                filters['year'] = selected_year
+            events_version = service.events_version
+            index = build_filter_index(events_df, events_version)
+            years = index.values['year']
+        options = {
+            'origin_country': service.get_countries(),
+            'main_impact_country': service.get_countries(),
+            'relevant_exchange': service.get_exchanges(),
+            'event_type': service.get_event_types(),
+            'year': years,
+            'month': MONTHS
+        }
         
-        # Get filtered events
-        filtered_df = service.get_events(filters)
+        filters = {}
+        filter_cols = st.columns(3)
+        for i, column in enumerate(FILTER_COLUMNS):
+            with filter_cols[i % 3]:
+                selected = st.multiselect(f"Select {FILTER_LABELS[column]}", options[column])
+            if selected:
+                filters[column] = selected
+        filter_key = tuple((column, tuple(values)) for column, values in filters.items())
         
         # Display data in an editable table format
         st.subheader("Events Table")
         
+        if paginated:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(50))
+            page_query = (filter_key, page_size)
+            if st.session_state.page_query != page_query:
+                st.session_state.page_query = page_query
+                st.session_state.page_cursors = [None]
+            cursors = st.session_state.page_cursors
+            source_df, next_cursor = service.get_events_page(filters, cursors[-1], page_size)
+            if next_cursor:
+                service.prefetch_page(filters, next_cursor, page_size)
+        else:
+            # Filter the loaded events locally through the bitmap index
+            filtered_df = events_df[index.mask(filters)].reset_index(drop=True)
+            source_df = filtered_df
+        
+        if st.session_state.show_edit_form and st.session_state.edit_event_id is not None:
+            # The event is looked up among those already loaded: the current
+            # page, or all events when not paginated
+            loaded_df = source_df if paginated else events_df
+            match = loaded_df[loaded_df['id'] == st.session_state.edit_event_id]
+            with edit_container:
+                st.subheader("Edit Event")
+                if match.empty:
+                    st.info("The event is not on the current page.")
+                else:
+                    show_event_form(match.iloc[0].to_dict())
+        
         # Prepare display columns
         display_columns = ['event_name', 'event_type', 'origin_country', 'main_impact_country', 
                          'relevant_exchange', 'month', 'year', 'description']
         
+        # Categorical cells only accept existing categories, so let the
+        # editor work on plain strings
+        table_df = source_df[display_columns].astype(
+            {col: object for col in CATEGORY_COLUMNS + ['month']}
+        )
+        
         # Create an editable dataframe with more height
         edited_df = st.data_editor(
-            filtered_df[display_columns],
+            table_df,
             use_container_width=True,
             num_rows="dynamic",
             height=600,
@@ -212,18 +281,20 @@ def main():
             hide_index=True,
         )
         
+        if paginated:
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                st.button("◀ Previous", disabled=len(cursors) == 1, on_click=cursors.pop)
+            with col_page:
+                st.caption(f"Page {len(cursors)}")
+            with col_next:
+                st.button("Next ▶", disabled=not next_cursor,
+                          on_click=cursors.append, args=(next_cursor,))
+        
         # Add save button for table changes
         if st.button("💾 Save Changes"):
             try:
-                success = True
-                for index, row in filtered_df.iterrows():
-                    edited_row = edited_df.iloc[index]
-                    event_data = {col: edited_row[col] for col in display_columns}
-                    if not service.update_event(row['id'], event_data):
-                        success = False
-                        break
-                
-                if success:
+                if save_table_edits(service, source_df, table_df, edited_df, display_columns):
                     st.success("Changes saved successfully!")
                     st.experimental_rerun()
                 else:
@@ -251,81 +322,69 @@ def main():
         with col6:
             st.metric("Events This Year", stats.get('events_this_year', 0))
         
-        # Create visualizations
-        st.subheader("Event Distribution")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Events by origin country
-            country_counts = filtered_df['origin_country'].value_counts().reset_index()
-            fig_country = px.bar(
-                country_counts,
-                x='origin_country',
-                y='count',
-                title="Events by Origin Country"
-            )
-            st.plotly_chart(fig_country, use_container_width=True)
-        
-        with col2:
-            # Events by type
-            type_counts = filtered_df['event_type'].value_counts().reset_index()
-            fig_type = px.pie(
-                type_counts,
-                names='event_type',
-                values='count',
-                title="Events by Type"
-            )
-            st.plotly_chart(fig_type, use_container_width=True)
-        
-        # Timeline view
-        st.subheader("Events Timeline")
-        timeline_df = filtered_df.copy()
-        timeline_df['date'] = pd.to_datetime(timeline_df['year'].astype(str) + '-' + 
-                                           timeline_df['month'].map(lambda x: {
-                                               'January': '01', 'February': '02', 'March': '03',
-                                               'April': '04', 'May': '05', 'June': '06',
-                                               'July': '07', 'August': '08', 'September': '09',
-                                               'October': '10', 'November': '11', 'December': '12'
-                                           }.get(x, '01')) + '-01')
-        
-        fig_timeline = px.scatter(
-            timeline_df,
-            x='date',
-            y='event_type',
-            color='origin_country',
-            hover_data=['event_name', 'description'],
-            title="Events Timeline"
-        )
-        st.plotly_chart(fig_timeline, use_container_width=True)
+        if paginated:
+            by_place = service.get_event_pivot('origin_country', 'event_type', filters)
+            by_date = service.get_event_pivot('year', 'month', filters)
+            charts = build_pivot_charts(by_place, by_date) if by_place and by_date else None
+        else:
+            charts = build_charts(filtered_df, events_version, filter_key)
         
-        # Additional statistics
-        st.subheader("Event Statistics")
+        if charts is None:
+            st.info("Charts of the paginated table need GET /api/events/pivot; "
+                    "turn off pagination to chart the loaded events.")
+        else:
+            # Create visualizations
+            st.subheader("Event Distribution")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Events by origin country
+                st.plotly_chart(charts['country'], use_container_width=True)
+            
+            with col2:
+                # Events by type
+                st.plotly_chart(charts['type'], use_container_width=True)
+            
+            # Timeline view; without the events, as counts per year and month
+            st.subheader("Events Timeline")
+            if paginated:
+                timeline = pivot_heatmap(by_date, FILTER_LABELS['year'], FILTER_LABELS['month'])
+            else:
+                window = timeline_window(filtered_df)
+                timeline = build_timeline(filtered_df, events_version, filter_key, window)
+            if timeline:
+                st.plotly_chart(timeline, use_container_width=True)
+            
+            # Additional statistics
+            st.subheader("Event Statistics")
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Events per year
+                st.plotly_chart(charts['yearly'], use_container_width=True)
+            
+            with col2:
+                # Events per month
+                st.plotly_chart(charts['monthly'], use_container_width=True)
+
+        # Cross-tabulation of two columns
+        st.subheader("Pivot")
         col1, col2 = st.columns(2)
-        
         with col1:
-            # Events per year
-            yearly_events = filtered_df['year'].value_counts().sort_index()
-            fig_yearly = px.line(
-                x=yearly_events.index,
-                y=yearly_events.values,
-                title="Events per Year",
-                labels={'x': 'Year', 'y': 'Number of Events'}
-            )
-            st.plotly_chart(fig_yearly, use_container_width=True)
-        
+            pivot_rows = st.selectbox("Rows", FILTER_COLUMNS, format_func=FILTER_LABELS.get)
         with col2:
-            # Events per month
-            monthly_events = filtered_df['month'].value_counts()
-            # Reorder months
-            monthly_events = monthly_events.reindex(MONTHS)
-            fig_monthly = px.bar(
-                x=monthly_events.index,
-                y=monthly_events.values,
-                title="Events per Month",
-                labels={'x': 'Month', 'y': 'Number of Events'}
-            )
-            st.plotly_chart(fig_monthly, use_container_width=True)
+            pivot_cols = st.selectbox("Columns", [c for c in FILTER_COLUMNS if c != pivot_rows],
+                                      index=2, format_func=FILTER_LABELS.get)
+        # Counted by the backend; older backends fall back to the loaded events
+        payload = service.get_event_pivot(pivot_rows, pivot_cols, filters)
+        if payload is None and not paginated:
+            payload = pivot_matrix(filtered_df, pivot_rows, pivot_cols)
+        heatmap = pivot_heatmap(payload, FILTER_LABELS[pivot_rows], FILTER_LABELS[pivot_cols]) if payload else None
+        if heatmap:
+            st.plotly_chart(heatmap, use_container_width=True)
+        else:
+            st.info("No events to pivot.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
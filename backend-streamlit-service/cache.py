@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates only exclude each other within a process
+    fcntl = None
+
+class SnapshotCache:
+    """On-disk snapshot of the last event frame and reference lists.
+
+    The events frame is kept as Parquet so dtypes (categoricals, nullable
+    integers) survive a round trip; reference lists and the data version
+    of every entry live in a small JSON manifest.
+    """
+
+    EVENTS_FILE = 'events.parquet'
+    MANIFEST_FILE = 'manifest.json'
+    LOCK_FILE = 'manifest.lock'
+
+    def __init__(self, cache_dir: str):
+        self.path = Path(cache_dir)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.manifest = self._read_manifest()
+        # Saves come from both the session and the revalidation thread
+        self._lock = threading.Lock()
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.path / self.MANIFEST_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _replace(self, name: str, write):
+        """Write a file next to its target and rename it into place"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=f".{name}.")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, self.path / name)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the cache directory against other threads and processes"""
+        with self._lock, open(self.path / self.LOCK_FILE, 'a') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _update_manifest(self, key: str, entry: dict):
+        """Set one manifest entry, keeping entries other sessions wrote.
+
+        Every session sharing CACHE_DIR has its own instance, so the
+        manifest is re-read under the lock rather than written back from
+        memory.
+        """
+        manifest = self._read_manifest()
+        manifest[key] = entry
+
+        def write(tmp_path):
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+        self._replace(self.MANIFEST_FILE, write)
+        self.manifest = manifest
+
+    def has(self, key: str) -> bool:
+        return key in self.manifest
+
+    def version(self, key: str) -> Optional[str]:
+        """Data version the cached entry was stored with, if any"""
+        return self.manifest.get(key, {}).get('version')
+
+    def load_events(self) -> Optional[pd.DataFrame]:
+        if not self.has('events'):
+            return None
+        try:
+            return pd.read_parquet(self.path / self.EVENTS_FILE)
+        except Exception as e:
+            print(f"Error reading cached events: {str(e)}")
+            return None
+
+    def save_events(self, df: pd.DataFrame, version: Optional[str] = None):
+        with self._exclusive():
+            self._replace(self.EVENTS_FILE, lambda tmp_path: df.to_parquet(tmp_path, index=False))
+            self._update_manifest('events', {
+                'version': version,
+                'saved_at': datetime.now().isoformat()
+            })
+
+    def load_list(self, key: str) -> Optional[List[str]]:
+        return self.manifest.get(key, {}).get('values')
+
+    def save_list(self, key: str, values: List[str], version: Optional[str] = None):
+        with self._exclusive():
+            self._update_manifest(key, {
+                'version': version,
+                'values': values,
+                'saved_at': datetime.now().isoformat()
+            })
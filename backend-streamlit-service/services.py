@@ -1,36 +1,275 @@
 import os
+import threading
+import time
 import httpx
 import pandas as pd
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from cache import SnapshotCache
+from aggregates import add_date_columns, frame_version
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December']
+
+# Media type for the Arrow IPC streaming format
+ARROW_STREAM_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Dropdown-backed columns are stored as categoricals so each distinct
+# string is held once instead of once per row
+CATEGORY_COLUMNS = ['event_type', 'origin_country', 'main_impact_country', 'relevant_exchange']
+INTEGER_COLUMNS = ['id', 'year']
+
+# Reference lists kept in the disk snapshot, by cache key
+REFERENCE_LISTS = {
+    'countries': '/api/countries',
+    'event_types': '/api/event-types',
+    'exchanges': '/api/exchanges'
+}
+
+# Response header carrying the opaque cursor of the next page
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+# Number of fetched pages kept in memory and how long they stay valid
+PAGE_CACHE_SIZE = 16
+PAGE_TTL = 30.0
+# How long data the backend sent without an ETag is reused before it is
+# fetched again; a write by this session drops it right away
+UNVALIDATED_TTL = 30.0
+
+def to_typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast an events frame to compact dtypes and add the derived date columns"""
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'month' in df.columns:
+        df['month'] = df['month'].astype(pd.CategoricalDtype(MONTHS, ordered=True))
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+    if 'month' in df.columns and 'year' in df.columns:
+        add_date_columns(df)
+    return df
 
 class EventService:
     def __init__(self):
         self.backend_url = os.getenv('BACKEND_URL', 'http://localhost:8080')
         self.client = httpx.Client(timeout=30.0)
+        self._pages = OrderedDict()
+        # Data version of the kept unfiltered events: the backend's ETag, or a
+        # content hash computed once per fetch when it sends none
+        self.events_version = None
+        self._pages_lock = threading.Lock()
+        # Bumped by every write; pages fetched under an older generation are not cached
+        self._pages_generation = 0
+
+        # Last unfiltered events and reference lists, by key, as (value, ETag,
+        # fetch time). The ETag is sent back as If-None-Match, so unchanged
+        # data is answered with 304 Not Modified and the kept value reused;
+        # without one the value is reused for UNVALIDATED_TTL seconds
+        self._current = {}
+
+        # Optional disk snapshot: a new session renders from it right away
+        # while a background thread revalidates it against the backend
+        cache_dir = os.getenv('CACHE_DIR')
+        self.cache = SnapshotCache(cache_dir) if cache_dir else None
+        self.stale = False
+        if self.cache and self.cache.has('events'):
+            events = self.cache.load_events()
+            if events is not None:
+                # Snapshots written by older versions lack the derived columns
+                if 'date' not in events.columns:
+                    events = to_typed_frame(events)
+                self._current['events'] = (events, self.cache.version('events'), None)
+                self.events_version = self.cache.version('events') or frame_version(events)
+                for key in REFERENCE_LISTS:
+                    values = self.cache.load_list(key)
+                    if values is not None:
+                        self._current[key] = (values, self.cache.version(key), None)
+                self.stale = True
+        if self.stale:
+            threading.Thread(target=self._revalidate, daemon=True).start()
+
+    def _refresh(self, key: str, path: str, read, headers: Optional[Dict] = None):
+        """Current value of an unfiltered resource.
+
+        Sends the ETag of the kept value as If-None-Match; on 304 the kept
+        value is returned, otherwise `read(response)` replaces it. A value
+        fetched without an ETag is returned as is while it is recent.
+        """
+        headers = dict(headers or {})
+        current = self._current.get(key)
+        if current and not current[1] and current[2] is not None \
+                and time.monotonic() - current[2] < UNVALIDATED_TTL:
+            return current[0]
+        if current and current[1]:
+            headers['If-None-Match'] = current[1]
+        response = self.client.get(f"{self.backend_url}{path}", headers=headers)
+        if current and response.status_code == 304:
+            return current[0]
+        value = read(response)
+        self._keep(key, value, response.headers.get('etag'))
+        return value
+
+    def _keep(self, key: str, value, version: Optional[str]):
+        """Hold a freshly fetched value in memory and in the disk snapshot"""
+        self._current[key] = (value, version, time.monotonic())
+        if key == 'events':
+            self.events_version = version or frame_version(value)
+        if self._should_store(key, version):
+            if key == 'events':
+                self.cache.save_events(value, version)
+            else:
+                self.cache.save_list(key, value, version)
+
+    def _revalidate(self):
+        """Refresh the kept data and the disk snapshot, then switch the session to live data"""
+        try:
+            self._refresh('events', '/api/events', self._read_events, self._events_headers())
+            for key, path in REFERENCE_LISTS.items():
+                self._refresh(key, path, self._read_list)
+        except Exception as e:
+            # Keep serving the snapshot while the backend is unreachable
+            print(f"Error refreshing cache: {str(e)}")
+            return
+        self.stale = False
+
+    def _should_store(self, key: str, version: Optional[str]) -> bool:
+        if not self.cache:
+            return False
+        # Without a version the snapshot cannot be compared, so it is replaced
+        return not self.cache.has(key) or version is None or version != self.cache.version(key)
+
+    def _events_headers(self) -> Dict:
+        return {'Accept': f"{ARROW_STREAM_TYPE}, application/json;q=0.9"}
+
+    def _read_events(self, response: httpx.Response) -> pd.DataFrame:
+        return to_typed_frame(self._read_frame(response))
+
+    def _read_list(self, response: httpx.Response) -> List[str]:
+        return [item['value'] for item in self._handle_response(response)]
+
+    def _get_list(self, key: str) -> List[str]:
+        """Get a reference list from the snapshot or the backend"""
+        if self.stale and key in self._current:
+            return list(self._current[key][0])
+        return list(self._refresh(key, REFERENCE_LISTS[key], self._read_list))
 
     def _handle_response(self, response: httpx.Response) -> dict:
         """Handle API response and errors"""
         response.raise_for_status()
         return response.json()
 
+    def _read_frame(self, response: httpx.Response) -> pd.DataFrame:
+        """Build a DataFrame from an Arrow IPC or JSON response"""
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '')
+        if content_type.startswith(ARROW_STREAM_TYPE):
+            import pyarrow as pa
+            with pa.ipc.open_stream(response.content) as reader:
+                return reader.read_pandas()
+        return pd.DataFrame(response.json())
+
     def get_events(self, filters: Optional[Dict] = None) -> pd.DataFrame:
-        """Get events with optional filters"""
+        """Get events with optional filters.
+
+        A filter value may be a list, sent as a repeated query parameter
+        to match any of the values.
+
+        Asks for an Arrow IPC stream and falls back to JSON when the
+        backend does not support it. Unfiltered requests are answered from
+        the disk snapshot until it has been revalidated, and afterwards
+        from the kept frame while the backend answers 304.
+        """
         try:
-            params = filters if filters else {}
-            response = self.client.get(f"{self.backend_url}/api/events", params=params)
-            data = self._handle_response(response)
-            return pd.DataFrame(data)
+            if not filters:
+                if self.stale and 'events' in self._current:
+                    return self._current['events'][0].copy()
+                return self._refresh('events', '/api/events', self._read_events, self._events_headers()).copy()
+            response = self.client.get(
+                f"{self.backend_url}/api/events",
+                params=filters,
+                headers=self._events_headers()
+            )
+            return self._read_events(response)
         except Exception as e:
             print(f"Error fetching events: {str(e)}")
+            if not filters:
+                self.events_version = None
             return pd.DataFrame()
 
+    def _page_key(self, filters: Optional[Dict], cursor: Optional[str], limit: int) -> tuple:
+        filter_items = sorted((col, tuple(values) if isinstance(values, list) else values)
+                              for col, values in (filters or {}).items())
+        return (tuple(filter_items), cursor, limit)
+
+    def _fetch_page(self, filters: Optional[Dict], cursor: Optional[str], limit: int) -> Tuple[pd.DataFrame, Optional[str]]:
+        generation = self._pages_generation
+        params = dict(filters or {})
+        params['limit'] = limit
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(
+            f"{self.backend_url}/api/events",
+            params=params,
+            headers=self._events_headers()
+        )
+        page = (to_typed_frame(self._read_frame(response)), response.headers.get(NEXT_CURSOR_HEADER))
+        with self._pages_lock:
+            # A write that finished during the request may not be in this page
+            if generation == self._pages_generation:
+                self._pages[self._page_key(filters, cursor, limit)] = (time.monotonic(), page)
+                while len(self._pages) > PAGE_CACHE_SIZE:
+                    self._pages.popitem(last=False)
+        return page
+
+    def get_events_page(self, filters: Optional[Dict] = None, cursor: Optional[str] = None,
+                        limit: int = 50) -> Tuple[pd.DataFrame, Optional[str]]:
+        """Get one page of events and the cursor of the following page.
+
+        Pages are cached briefly so that moving back and forth, or reaching
+        a page that was prefetched, needs no request.
+        """
+        key = self._page_key(filters, cursor, limit)
+        try:
+            with self._pages_lock:
+                cached = self._pages.get(key)
+                if cached and time.monotonic() - cached[0] < PAGE_TTL:
+                    self._pages.move_to_end(key)
+                    df, next_cursor = cached[1]
+                    return df.copy(), next_cursor
+            return self._fetch_page(filters, cursor, limit)
+        except Exception as e:
+            print(f"Error fetching events page: {str(e)}")
+            return pd.DataFrame(), None
+
+    def prefetch_page(self, filters: Optional[Dict] = None, cursor: Optional[str] = None, limit: int = 50):
+        """Fetch a page in the background so it is cached when requested"""
+        key = self._page_key(filters, cursor, limit)
+        with self._pages_lock:
+            cached = self._pages.get(key)
+            if cached and time.monotonic() - cached[0] < PAGE_TTL:
+                return
+
+        def fetch():
+            try:
+                self._fetch_page(filters, cursor, limit)
+            except Exception as e:
+                print(f"Error prefetching events page: {str(e)}")
+
+        threading.Thread(target=fetch, daemon=True).start()
+
+    def _invalidate_events(self):
+        """Drop the kept frame and cached pages after a write"""
+        self._current.pop('events', None)
+        with self._pages_lock:
+            self._pages_generation += 1
+            self._pages.clear()
+
     def get_countries(self) -> List[str]:
         """Get list of countries"""
         try:
-            response = self.client.get(f"{self.backend_url}/api/countries")
-            data = self._handle_response(response)
-            return [country['value'] for country in data]
+            return self._get_list('countries')
         except Exception as e:
             print(f"Error fetching countries: {str(e)}")
             return []
@@ -38,9 +277,7 @@ class EventService:
     def get_event_types(self) -> List[str]:
         """Get list of event types"""
         try:
-            response = self.client.get(f"{self.backend_url}/api/event-types")
-            data = self._handle_response(response)
-            return [event_type['value'] for event_type in data]
+            return self._get_list('event_types')
         except Exception as e:
             print(f"Error fetching event types: {str(e)}")
             return []
@@ -48,9 +285,7 @@ class EventService:
     def get_exchanges(self) -> List[str]:
         """Get list of exchanges"""
         try:
-            response = self.client.get(f"{self.backend_url}/api/exchanges")
-            data = self._handle_response(response)
-            return [exchange['value'] for exchange in data]
+            return self._get_list('exchanges')
         except Exception as e:
             print(f"Error fetching exchanges: {str(e)}")
             return []
@@ -58,11 +293,14 @@ class EventService:
     def create_event(self, event_data: Dict) -> bool:
         """Create a new event"""
         try:
+            # Writes must be visible right away, so stop serving the snapshot
+            self.stale = False
             response = self.client.post(
                 f"{self.backend_url}/api/events",
                 json=event_data
             )
             self._handle_response(response)
+            self._invalidate_events()
             return True
         except Exception as e:
             print(f"Error creating event: {str(e)}")
@@ -71,11 +309,13 @@ class EventService:
     def update_event(self, event_id: int, event_data: Dict) -> bool:
         """Update an existing event"""
         try:
+            self.stale = False
             response = self.client.put(
                 f"{self.backend_url}/api/events/{event_id}",
                 json=event_data
             )
             self._handle_response(response)
+            self._invalidate_events()
             return True
         except Exception as e:
             print(f"Error updating event: {str(e)}")
@@ -84,13 +324,38 @@ class EventService:
     def delete_event(self, event_id: int) -> bool:
         """Delete an event"""
         try:
+            self.stale = False
             response = self.client.delete(f"{self.backend_url}/api/events/{event_id}")
             self._handle_response(response)
+            self._invalidate_events()
             return True
         except Exception as e:
             print(f"Error deleting event: {str(e)}")
             return False
 
+    def get_event_pivot(self, rows: str, cols: str, filters: Optional[Dict] = None) -> Optional[Dict]:
+        """Event counts by two columns as a dense matrix, computed by the backend.
+
+        Returns None when the backend cannot answer (e.g. it predates the
+        pivot endpoint), so the caller can pivot the loaded events instead.
+        """
+        try:
+            response = self.client.get(
+                f"{self.backend_url}/api/events/pivot",
+                params={**(filters or {}), 'rows': rows, 'cols': cols}
+            )
+            return self._handle_response(response)
+        except Exception as e:
+            print(f"Error fetching event pivot: {str(e)}")
+            return None
+
+    def get_event_years(self) -> List[int]:
+        """Years that have events, from a pivot rather than the events themselves"""
+        payload = self.get_event_pivot('year', 'month')
+        if payload is None:
+            return []
+        return [int(year) for year in payload['row_labels'] if str(year).isdigit()]
+
     def get_event_stats(self) -> Dict:
         """Get event statistics"""
         try:
@@ -0,0 +1,238 @@
+# Copy of backend-streamlit-service/aggregates.py. Each dashboard is installed
+# and run from its own directory, so the module is not shared; keep the
+# two copies identical.
+
+import datetime
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December']
+
+# Above this many events the timeline shows a heatmap instead of one marker per event
+TIMELINE_MAX_POINTS = int(os.getenv('TIMELINE_MAX_POINTS', 5000))
+
+# Columns derived from month and year when events are loaded
+DERIVED_COLUMNS = ['month_code', 'date']
+
+# Dimensions the Analytics tab charts break events down by
+CHART_DIMENSIONS = ['origin_country', 'event_type', 'year', 'month_code']
+
+def add_date_columns(df):
+    """Add an integer month_code (1-12, 0 when unknown) and a first-of-month date.
+
+    Dates are built with integer month arithmetic on datetime64[M] rather
+    than by formatting and parsing a string per row. Unknown months fall on
+    January, as the string-based timeline did.
+    """
+    codes = pd.Categorical(df['month'], categories=MONTHS).codes + 1
+    df['month_code'] = codes.astype('int8')
+    years = pd.to_numeric(df['year'], errors='coerce').to_numpy(dtype='float64')
+    months = (years - 1970) * 12 + (np.maximum(codes, 1) - 1)
+    valid = ~np.isnan(months)
+    dates = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[M]')
+    dates[valid] = months[valid].astype('int64').astype('datetime64[M]')
+    df['date'] = dates.astype('datetime64[ns]')
+    return df
+
+def frame_version(df):
+    """Content hash of a frame, for when no better data version is known"""
+    return str(pd.util.hash_pandas_object(df, index=False).sum())
+
+def compute_aggregates(df):
+    """Compute every chart input from a single groupby over the chart dimensions.
+
+    The per-dimension counts are sums over the (small) grouped cube rather
+    than separate value_counts() scans of the full frame.
+    """
+    cube = df.groupby(CHART_DIMENSIONS, observed=True, dropna=False).size()
+    year_counts = cube.groupby(level='year').sum().sort_index()
+    return {
+        'country': cube.groupby(level='origin_country', observed=True).sum().sort_values(ascending=False),
+        'type': cube.groupby(level='event_type', observed=True).sum().sort_values(ascending=False),
+        'year': year_counts,
+        'month': pd.Series(
+            cube.groupby(level='month_code').sum().reindex(range(1, 13)).to_numpy(),
+            index=MONTHS
+        ),
+        'metrics': {
+            'total_events': len(df),
+            'total_origin_countries': df['origin_country'].nunique(),
+            'total_impact_countries': df['main_impact_country'].nunique(),
+            'total_event_types': df['event_type'].nunique(),
+            'total_exchanges': df['relevant_exchange'].nunique(),
+            'events_this_year': int(year_counts.get(datetime.datetime.now().year, 0))
+        }
+    }
+
+def _chart_figures(aggregates):
+    # plotly is only needed once the Analytics tab is drawn
+    import plotly.express as px
+    return {
+        'country': px.bar(
+            aggregates['country'].rename('count').reset_index(),
+            x='origin_country',
+            y='count',
+            title="Events by Origin Country"
+        ),
+        'type': px.pie(
+            aggregates['type'].rename('count').reset_index(),
+            names='event_type',
+            values='count',
+            title="Events by Type"
+        ),
+        'yearly': px.line(
+            x=aggregates['year'].index,
+            y=aggregates['year'].values,
+            title="Events per Year",
+            labels={'x': 'Year', 'y': 'Number of Events'}
+        ),
+        'monthly': px.bar(
+            x=aggregates['month'].index,
+            y=aggregates['month'].values,
+            title="Events per Month",
+            labels={'x': 'Month', 'y': 'Number of Events'}
+        )
+    }
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_charts(_df, version, filters):
+    """Build the Analytics tab figures for a filtered frame.
+
+    Memoized on the data version and the filter tuple, so reruns caused by
+    unrelated widgets reuse the figures instead of recomputing them. The
+    frame must carry the columns added by add_date_columns().
+    """
+    aggregates = compute_aggregates(_df)
+    return {'metrics': aggregates['metrics'], **_chart_figures(aggregates)}
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_pivot_charts(by_place, by_date):
+    """Build the same figures as build_charts() from two pivot payloads:
+    origin country by event type, and year by month.
+
+    For when the events are not loaded; the payloads, and so the cost,
+    depend on the number of distinct values rather than of events.
+    """
+    return _chart_figures({
+        'country': pd.Series(by_place['row_totals'], index=pd.Index(by_place['row_labels'], name='origin_country')),
+        'type': pd.Series(by_place['col_totals'], index=pd.Index(by_place['col_labels'], name='event_type')),
+        'year': pd.Series(by_date['row_totals'], index=pd.to_numeric(pd.Index(by_date['row_labels']), errors='coerce')),
+        'month': pd.Series(by_date['col_totals'], index=by_date['col_labels'], dtype='float64').reindex(MONTHS)
+    })
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_timeline(_df, version, filters, window=None):
+    """Build the timeline figure for the events inside a (start, end) date window.
+
+    Up to TIMELINE_MAX_POINTS events are drawn as individual markers. Larger
+    selections are binned here into event counts per month and event type
+    and drawn as a heatmap, so the figure payload depends on the number of
+    months and types rather than on the number of events.
+    """
+    import plotly.express as px
+    timeline_df = _df
+    if window:
+        start, end = (np.datetime64(bound, 'ns') for bound in window)
+        timeline_df = timeline_df[(timeline_df['date'] >= start) & (timeline_df['date'] <= end)]
+
+    if len(timeline_df) <= TIMELINE_MAX_POINTS:
+        # Plotly looks up a group for every category, including filtered-out ones
+        timeline_df = timeline_df[['date', 'event_type', 'origin_country', 'event_name', 'description']].apply(
+            lambda col: col.cat.remove_unused_categories() if isinstance(col.dtype, pd.CategoricalDtype) else col
+        )
+        return px.scatter(
+            timeline_df,
+            x='date',
+            y='event_type',
+            color='origin_country',
+            hover_data=['event_name', 'description'],
+            title="Events Timeline"
+        )
+
+    counts = timeline_df.groupby(['event_type', 'date'], observed=True).size().unstack(fill_value=0)
+    counts = counts.reindex(
+        columns=pd.date_range(counts.columns.min(), counts.columns.max(), freq='MS'),
+        fill_value=0
+    )
+    return px.imshow(
+        counts,
+        aspect='auto',
+        labels={'x': 'Month', 'y': 'Event Type', 'color': 'Events'},
+        title=f"Events Timeline ({len(timeline_df):,} events; narrow the window to see individual events)"
+    )
+
+def timeline_window(df):
+    """Date window slider for the timeline, or None when there is nothing to narrow"""
+    dates = df['date'].dropna()
+    if dates.empty:
+        return None
+    first, last = dates.min().date(), dates.max().date()
+    if first == last:
+        return None
+    return st.slider("Timeline window", min_value=first, max_value=last,
+                     value=(first, last), format="MMM YYYY")
+
+def _pivot_codes(series):
+    """Categorical codes (-1 for missing) and labels of a column"""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('string').astype('category')
+    return series.cat.codes.to_numpy(), [str(label) for label in series.cat.categories]
+
+def _pivot_order(dimension, labels, totals):
+    """Indexes of the labels that occur, in display order: months by calendar,
+    years ascending, others by count"""
+    if dimension == 'month':
+        key = lambda i: (MONTHS.index(labels[i]) if labels[i] in MONTHS else len(MONTHS), labels[i])
+    elif dimension == 'year':
+        key = lambda i: (len(labels[i]), labels[i])
+    else:
+        key = lambda i: (-totals[i], labels[i])
+    return [i for i in sorted(range(len(labels)), key=key) if totals[i] > 0]
+
+def pivot_matrix(df, rows, cols):
+    """Event counts for every pair of values of two columns.
+
+    Counted with one bincount over the columns' categorical codes. Returns
+    the same dense-matrix payload as the backend's GET /events/pivot.
+    """
+    row_codes, row_labels = _pivot_codes(df[rows])
+    col_codes, col_labels = _pivot_codes(df[cols])
+    valid = (row_codes >= 0) & (col_codes >= 0)
+    width = len(col_labels)
+    matrix = np.bincount(row_codes[valid].astype(np.int64) * width + col_codes[valid],
+                         minlength=len(row_labels) * width).reshape(len(row_labels), width)
+    row_order = _pivot_order(rows, row_labels, matrix.sum(axis=1))
+    col_order = _pivot_order(cols, col_labels, matrix.sum(axis=0))
+    matrix = matrix[np.ix_(row_order, col_order)]
+    return {
+        'rows': rows,
+        'cols': cols,
+        'row_labels': [row_labels[i] for i in row_order],
+        'col_labels': [col_labels[i] for i in col_order],
+        'values': matrix.tolist(),
+        'row_totals': matrix.sum(axis=1).tolist(),
+        'col_totals': matrix.sum(axis=0).tolist(),
+        'total': int(matrix.sum())
+    }
+
+def pivot_heatmap(payload, row_title, col_title):
+    """Heatmap figure for a pivot payload, or None when it is empty"""
+    if not payload['values'] or not payload['col_labels']:
+        return None
+    import plotly.express as px
+    return px.imshow(
+        np.array(payload['values']),
+        x=payload['col_labels'],
+        y=payload['row_labels'],
+        aspect='auto',
+        labels={'x': col_title, 'y': row_title, 'color': 'Events'},
+        title=f"Events by {row_title} and {col_title}"
+    )
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_pivot(_df, version, filters, rows, cols, row_title, col_title):
+    """Pivot heatmap for a filtered frame, memoized like build_charts()"""
+    return pivot_heatmap(pivot_matrix(_df, rows, cols), row_title, col_title)
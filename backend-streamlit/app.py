@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from pathlib import Path
 import datetime
 import csv
 import os
 from dotenv import load_dotenv
+from aggregates import MONTHS, DERIVED_COLUMNS, add_date_columns, build_charts, build_pivot, build_timeline, timeline_window
+import csv_cache
+import sqlite_store
+from filter_index import FILTER_COLUMNS, build_filter_index
 
 # Load environment variables
 load_dotenv()
@@ -33,52 +36,156 @@ COUNTRIES_FILE = os.getenv('COUNTRIES_FILE', './data/countries.csv')
 EVENT_TYPES_FILE = os.getenv('EVENT_TYPES_FILE', './data/event_types.csv')
 EXCHANGES_FILE = os.getenv('EXCHANGES_FILE', './data/exchanges.csv')
 
-MONTHS = ['January', 'February', 'March', 'April', 'May', 'June',
-          'July', 'August', 'September', 'October', 'November', 'December']
+# Optional embedded SQLite database. When set, events and reference data are
+# kept there (imported once from the CSV files above) instead of in the CSVs.
+EVENTS_DB = os.getenv('EVENTS_DB')
+
+FILTER_LABELS = {
+    'origin_country': "Origin Countries",
+    'main_impact_country': "Impact Countries",
+    'relevant_exchange': "Exchanges",
+    'event_type': "Event Types",
+    'year': "Years",
+    'month': "Months"
+}
+
+REFERENCE_FILES = {
+    'countries': COUNTRIES_FILE,
+    'event_types': EVENT_TYPES_FILE,
+    'exchanges': EXCHANGES_FILE
+}
+
+def events_version():
+    """Data version of the events, from the database or the file's modification time and size"""
+    if EVENTS_DB:
+        return sqlite_store.data_version(EVENTS_DB)
+    try:
+        stat = os.stat(EVENTS_FILE)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    except OSError:
+        return None
 
 def load_data():
-    """Load data from CSV files"""
+    """Load data from CSV files, re-reading only files that changed.
+
+    With EVENTS_DB set, events are queried per filter combination through
+    filter_events() instead, so no events frame is returned.
+    """
     try:
-        events_df = pd.read_csv(EVENTS_FILE)
-        countries_df = pd.read_csv(COUNTRIES_FILE)
-        event_types_df = pd.read_csv(EVENT_TYPES_FILE)
-        exchanges_df = pd.read_csv(EXCHANGES_FILE)
+        if EVENTS_DB:
+            sqlite_store.initialize(EVENTS_DB, EVENTS_FILE, REFERENCE_FILES)
+            return (None,) + tuple(sqlite_store.load_reference(EVENTS_DB, table) for table in REFERENCE_FILES)
+        events_df = csv_cache.read_csv(EVENTS_FILE, add_date_columns)
+        countries_df = csv_cache.read_csv(COUNTRIES_FILE)
+        event_types_df = csv_cache.read_csv(EVENT_TYPES_FILE)
+        exchanges_df = csv_cache.read_csv(EXCHANGES_FILE)
         return events_df, countries_df, event_types_df, exchanges_df
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None, None, None, None
 
 def save_event(event_data, is_edit=False):
-    """Save event to CSV file"""
+    """Save event to CSV file or the database"""
     try:
-        events_df = pd.read_csv(EVENTS_FILE)
+        if EVENTS_DB:
+            if is_edit:
+                sqlite_store.update_events(EVENTS_DB, [event_data])
+            else:
+                event_data['created_at'] = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+                event_data['id'] = sqlite_store.insert_event(EVENTS_DB, event_data)
+            return True
+        
+        events_df = csv_cache.read_csv(EVENTS_FILE, add_date_columns).drop(columns=DERIVED_COLUMNS)
         
         if is_edit:
             # Update existing event
             events_df.loc[events_df['id'] == event_data['id']] = event_data
         else:
             # Add new event
-            event_data['id'] = len(events_df) + 1
+            event_data['id'] = int(events_df['id'].max()) + 1 if len(events_df) else 1
             event_data['created_at'] = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
             events_df = pd.concat([events_df, pd.DataFrame([event_data])], ignore_index=True)
         
-        events_df.to_csv(EVENTS_FILE, index=False)
+        csv_cache.write_csv(EVENTS_FILE, events_df, add_date_columns)
         return True
     except Exception as e:
         st.error(f"Error saving event: {str(e)}")
         return False
 
 def delete_event(event_id):
-    """Delete event from CSV file"""
+    """Delete event from CSV file or the database"""
     try:
-        events_df = pd.read_csv(EVENTS_FILE)
+        if EVENTS_DB:
+            sqlite_store.delete_event(EVENTS_DB, event_id)
+            return True
+        
+        events_df = csv_cache.read_csv(EVENTS_FILE, add_date_columns).drop(columns=DERIVED_COLUMNS)
         events_df = events_df[events_df['id'] != event_id]
-        events_df.to_csv(EVENTS_FILE, index=False)
+        csv_cache.write_csv(EVENTS_FILE, events_df, add_date_columns)
         return True
     except Exception as e:
         st.error(f"Error deleting event: {str(e)}")
         return False
 
+def diff_edits(filtered_df, edited_df, columns):
+    """Edited rows that differ from the stored events, and which of their cells changed.
+
+    Rows are matched by the index labels st.data_editor keeps from
+    `filtered_df`, so deleting or adding rows in the editor cannot shift
+    edits onto other events; added rows are ignored and deleted ones are
+    left as stored. Both frames are indexed by event id.
+    """
+    kept = edited_df.index.intersection(filtered_df.index)
+    ids = pd.Index(filtered_df.loc[kept, 'id'], name='id')
+    edited = edited_df.loc[kept, columns].set_axis(ids)
+    current = filtered_df.loc[kept, columns].set_axis(ids)
+    changed = current.ne(edited) & ~(current.isna() & edited.isna())
+    rows = changed.any(axis=1)
+    return edited[rows], changed[rows]
+
+def save_table_edits(events_df, filtered_df, edited_df, columns):
+    """Apply every edited cell, cleared ones included, with a single write"""
+    edited, changed = diff_edits(filtered_df, edited_df, columns)
+    if edited.empty:
+        return
+    if EVENTS_DB:
+        sqlite_store.update_events(EVENTS_DB, [
+            {'id': event_id, **{column: None if pd.isna(value) else value
+                                for column, value in row[changed.loc[event_id]].items()}}
+            for event_id, row in edited.iterrows()
+        ])
+        return
+    updated_df = events_df.drop(columns=DERIVED_COLUMNS).set_index('id')
+    stored = updated_df.loc[edited.index, columns]
+    updated_df.loc[edited.index, columns] = edited.where(changed, stored)
+    csv_cache.write_csv(EVENTS_FILE, updated_df.reset_index(), add_date_columns)
+
+def get_event(events_df, event_id):
+    """Look up a single event as a dict"""
+    if EVENTS_DB:
+        return sqlite_store.get_event(EVENTS_DB, event_id)
+    return events_df[events_df['id'] == event_id].iloc[0].to_dict()
+
+def filter_options(events_df):
+    """Values offered by each filter, by column"""
+    if EVENTS_DB:
+        options = {column: sqlite_store.distinct_values(EVENTS_DB, column) for column in FILTER_COLUMNS}
+    else:
+        options = dict(build_filter_index(events_df, events_version()).values)
+    options['month'] = [month for month in MONTHS if month in options['month']]
+    return options
+
+def filter_events(events_df, selections):
+    """Events whose filter columns hold one of the selected values.
+
+    In CSV mode the selection is answered from the bitmap filter index,
+    which is built once per version of the events file.
+    """
+    if EVENTS_DB:
+        return add_date_columns(sqlite_store.load_events(EVENTS_DB, selections))
+    index = build_filter_index(events_df, events_version())
+    return events_df[index.mask(selections)]
+
 def show_event_form(events_df=None, event_data=None):
     """Show form for adding/editing events"""
     # Load reference data for dropdowns
@@ -153,7 +260,7 @@ def main():
     # Load data
     events_df, countries_df, event_types_df, exchanges_df = load_data()
     
-    if events_df is None:
+    if countries_df is None:
         st.error("Failed to load data. Please check the data files.")
         return
 
@@ -173,38 +280,20 @@ def main():
         
         if st.session_state.show_edit_form and st.session_state.edit_event_id is not None:
             st.subheader("Edit Event")
-            event_data = events_df[events_df['id'] == st.session_state.edit_event_id].iloc[0].to_dict()
+            event_data = get_event(events_df, st.session_state.edit_event_id)
             show_event_form(events_df, event_data)
 
         # Filters in a horizontal layout
         st.subheader("Filters")
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            # Country filter (using origin_country)
-            countries = sorted(events_df['origin_country'].unique())
-            selected_country = st.selectbox("Select Origin Country", ["All"] + countries)
-        with col2:
-            # Event type filter
-            event_types = sorted(events_df['event_type'].unique())
-            selected_event_type = st.selectbox("Select Event Type", ["All"] + event_types)
-        with col3:
-            # Month filter
-            selected_month = st.selectbox("Select Month", ["All"] + MONTHS)
-        with col4:
-            # Year filter
-            years = sorted(events_df['year'].unique())
-            selected_year = st.selectbox("Select Year", ["All"] + list(years))
+        options = filter_options(events_df)
+        selections = {}
+        filter_cols = st.columns(3)
+        for i, column in enumerate(FILTER_COLUMNS):
+            with filter_cols[i % 3]:
+                selections[column] = st.multiselect(f"Select {FILTER_LABELS[column]}", options[column])
         
         # Filter data
-        filtered_df = events_df.copy()
-        if selected_country != "All":
-            filtered_df = filtered_df[filtered_df['origin_country'] == selected_country]
-        if selected_event_type != "All":
-            filtered_df = filtered_df[filtered_df['event_type'] == selected_event_type]
-        if selected_month != "All":
-            filtered_df = filtered_df[filtered_df['month'] == selected_month]
-        if selected_year != "All":
-            filtered_df = filtered_df[filtered_df['year'] == selected_year]
+        filtered_df = filter_events(events_df, selections)
         
         # Display data in an editable table format
         st.subheader("Events Table")
@@ -267,36 +356,33 @@ def main():
         # Add save button for table changes
         if st.button("💾 Save Changes"):
             try:
-                # Update the original dataframe with edited values
-                for index, row in filtered_df.iterrows():
-                    edited_row = edited_df.iloc[index]
-                    for col in display_columns:
-                        events_df.at[index, col] = edited_row[col]
-                
-                # Save to CSV
-                events_df.to_csv(EVENTS_FILE, index=False)
+                save_table_edits(events_df, filtered_df, edited_df, display_columns)
                 st.success("Changes saved successfully!")
                 st.experimental_rerun()
             except Exception as e:
                 st.error(f"Error saving changes: {str(e)}")
     
     with tab2:
+        version = events_version()
+        filter_key = tuple((column, tuple(values)) for column, values in selections.items())
+        charts = build_charts(filtered_df, version, filter_key)
+        metrics = charts['metrics']
+        
         # Display metrics in a wider grid
         st.subheader("Key Metrics")
         col1, col2, col3, col4, col5, col6 = st.columns(6)
         with col1:
-            st.metric("Total Events", len(filtered_df))
+            st.metric("Total Events", metrics['total_events'])
         with col2:
-            st.metric("Total Origin Countries", len(filtered_df['origin_country'].unique()))
+            st.metric("Total Origin Countries", metrics['total_origin_countries'])
         with col3:
-            st.metric("Total Impact Countries", len(filtered_df['main_impact_country'].unique()))
+            st.metric("Total Impact Countries", metrics['total_impact_countries'])
         with col4:
-            st.metric("Total Event Types", len(filtered_df['event_type'].unique()))
+            st.metric("Total Event Types", metrics['total_event_types'])
         with col5:
-            st.metric("Total Exchanges", len(filtered_df['relevant_exchange'].unique()))
+            st.metric("Total Exchanges", metrics['total_exchanges'])
         with col6:
-            current_year = datetime.datetime.now().year
-            st.metric("Events This Year", len(filtered_df[filtered_df['year'] == current_year]))
+            st.metric("Events This Year", metrics['events_this_year'])
         
         # Create visualizations
         st.subheader("Event Distribution")
@@ -305,44 +391,16 @@ def main():
         
         with col1:
             # Events by origin country
-            fig_country = px.bar(
-                filtered_df['origin_country'].value_counts().reset_index(),
-                x='origin_country',
-                y='count',
-                title="Events by Origin Country"
-            )
-            st.plotly_chart(fig_country, use_container_width=True)
+            st.plotly_chart(charts['country'], use_container_width=True)
         
         with col2:
             # Events by type
-            fig_type = px.pie(
-                filtered_df['event_type'].value_counts().reset_index(),
-                names='event_type',
-                values='count',
-                title="Events by Type"
-            )
-            st.plotly_chart(fig_type, use_container_width=True)
+            st.plotly_chart(charts['type'], use_container_width=True)
         
         # Timeline view
         st.subheader("Events Timeline")
-        timeline_df = filtered_df.copy()
-        timeline_df['date'] = pd.to_datetime(timeline_df['year'].astype(str) + '-' + 
-                                           timeline_df['month'].map(lambda x: {
-                                               'January': '01', 'February': '02', 'March': '03',
-                                               'April': '04', 'May': '05', 'June': '06',
-                                               'July': '07', 'August': '08', 'September': '09',
-                                               'October': '10', 'November': '11', 'December': '12'
-                                           }.get(x, '01')) + '-01')
-        
-        fig_timeline = px.scatter(
-            timeline_df,
-            x='date',
-            y='event_type',
-            color='origin_country',
-            hover_data=['event_name', 'description'],
-            title="Events Timeline"
-        )
-        st.plotly_chart(fig_timeline, use_container_width=True)
+        window = timeline_window(filtered_df)
+        st.plotly_chart(build_timeline(filtered_df, version, filter_key, window), use_container_width=True)
         
         # Additional statistics
         st.subheader("Event Statistics")
@@ -350,27 +408,26 @@ def main():
         
         with col1:
             # Events per year
-            yearly_events = filtered_df['year'].value_counts().sort_index()
-            fig_yearly = px.line(
-                x=yearly_events.index,
-                y=yearly_events.values,
-                title="Events per Year",
-                labels={'x': 'Year', 'y': 'Number of Events'}
-            )
-            st.plotly_chart(fig_yearly, use_container_width=True)
+            st.plotly_chart(charts['yearly'], use_container_width=True)
         
         with col2:
             # Events per month
-            monthly_events = filtered_df['month'].value_counts()
-            # Reorder months
-            monthly_events = monthly_events.reindex(MONTHS)
-            fig_monthly = px.bar(
-                x=monthly_events.index,
-                y=monthly_events.values,
-                title="Events per Month",
-                labels={'x': 'Month', 'y': 'Number of Events'}
-            )
-            st.plotly_chart(fig_monthly, use_container_width=True)
+            st.plotly_chart(charts['monthly'], use_container_width=True)
+
+        # Cross-tabulation of two columns
+        st.subheader("Pivot")
+        col1, col2 = st.columns(2)
+        with col1:
+            pivot_rows = st.selectbox("Rows", FILTER_COLUMNS, format_func=FILTER_LABELS.get)
+        with col2:
+            pivot_cols = st.selectbox("Columns", [c for c in FILTER_COLUMNS if c != pivot_rows],
+                                      index=2, format_func=FILTER_LABELS.get)
+        heatmap = build_pivot(filtered_df, version, filter_key, pivot_rows, pivot_cols,
+                              FILTER_LABELS[pivot_rows], FILTER_LABELS[pivot_cols])
+        if heatmap:
+            st.plotly_chart(heatmap, use_container_width=True)
+        else:
+            st.info("No events to pivot.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import threading
+import pandas as pd
+
+# Parsed CSV frames shared by every session in the process. Streamlit
+# re-executes app.py on each rerun, so the cache lives in this module.
+# Entries are keyed by path and validated against the file's mtime and size.
+_frames = {}
+_lock = threading.Lock()
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def read_csv(path, prepare=None):
+    """Read a CSV file, parsing it again only if it changed since the last read.
+
+    `prepare` is applied once to the freshly parsed frame. The returned
+    frame is shared between sessions and must not be modified in place.
+    """
+    key = _file_key(path)
+    with _lock:
+        cached = _frames.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+    df = pd.read_csv(path)
+    if prepare:
+        df = prepare(df)
+    with _lock:
+        _frames[path] = (key, df)
+    return df
+
+def write_csv(path, df, prepare=None):
+    """Write a frame to a CSV file and keep it cached as the file's contents.
+
+    The frame is written to a temporary file next to the target and renamed
+    over it, so readers never see a partially written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            df.to_csv(f, index=False)
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    key = _file_key(path)
+    if prepare:
+        df = prepare(df)
+    with _lock:
+        _frames[path] = (key, df)
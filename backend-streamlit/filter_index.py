@@ -0,0 +1,65 @@
+# Copy of backend-streamlit-service/filter_index.py. Each dashboard is installed
+# and run from its own directory, so the module is not shared; keep the
+# two copies identical.
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Columns offered as multi-select filters
+FILTER_COLUMNS = ['origin_country', 'main_impact_country', 'relevant_exchange',
+                  'event_type', 'year', 'month']
+
+class FilterIndex:
+    """Packed per-value bitmaps over the filter columns of an events frame.
+
+    Each column is factorized once into categorical codes and every distinct
+    value gets a bitmap of the rows holding it. A selection is answered by
+    OR-ing the bitmaps of the selected values within a column and AND-ing
+    the columns, without comparing any strings.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.values = {}
+        self._positions = {}
+        self._bitmaps = {}
+        rows = np.arange(self.size)
+        for col in FILTER_COLUMNS:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            present = codes >= 0
+            # Set bit `row` of bitmap `code`, in np.packbits (big-endian) order
+            bitmaps = np.zeros((len(uniques), (self.size + 7) // 8), dtype=np.uint8)
+            np.bitwise_or.at(
+                bitmaps,
+                (codes[present], rows[present] >> 3),
+                (0x80 >> (rows[present] & 7)).astype(np.uint8)
+            )
+            self.values[col] = list(uniques)
+            self._positions[col] = {value: i for i, value in enumerate(uniques)}
+            self._bitmaps[col] = bitmaps
+
+    def mask(self, selections):
+        """Boolean row mask for a mapping of column to selected values.
+
+        Columns with no selected values are not filtered on.
+        """
+        result = None
+        for col, selected in selections.items():
+            if not selected:
+                continue
+            bitmaps = self._bitmaps[col]
+            column_bits = np.zeros(bitmaps.shape[1], dtype=np.uint8)
+            for value in selected:
+                position = self._positions[col].get(value)
+                if position is not None:
+                    column_bits |= bitmaps[position]
+            result = column_bits if result is None else result & column_bits
+        if result is None:
+            return np.ones(self.size, dtype=bool)
+        return np.unpackbits(result, count=self.size).astype(bool)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_filter_index(_df, version):
+    """Filter index for a frame, built once per data version"""
+    return FilterIndex(_df)
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+EVENT_COLUMNS = ['event_name', 'event_type', 'origin_country', 'main_impact_country',
+                 'relevant_exchange', 'month', 'year', 'description', 'created_at']
+
+# Reference tables, by the name the dashboard uses for them
+REFERENCE_TABLES = ['countries', 'event_types', 'exchanges']
+
+# Columns the dashboard filters on; each has an index
+FILTER_COLUMNS = ['origin_country', 'main_impact_country', 'relevant_exchange',
+                  'event_type', 'month', 'year']
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_name TEXT,
+    event_type TEXT,
+    origin_country TEXT,
+    main_impact_country TEXT,
+    relevant_exchange TEXT,
+    month TEXT,
+    year INTEGER,
+    description TEXT,
+    created_at TEXT
+);
+{''.join(f'CREATE INDEX IF NOT EXISTS idx_events_{col} ON events ({col});' for col in FILTER_COLUMNS)}
+{''.join(f'CREATE TABLE IF NOT EXISTS {table} (value TEXT PRIMARY KEY, order_index INTEGER);' for table in REFERENCE_TABLES)}
+CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT);
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('version', '0');
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+@contextmanager
+def connect(path):
+    """Open a connection; the block runs in one transaction"""
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _bump_version(conn):
+    conn.execute("UPDATE store_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+
+def initialize(path, events_file, reference_files):
+    """Create the schema and, the first time, import the existing CSV files.
+
+    `reference_files` maps each reference table name to its CSV path.
+    """
+    with _init_lock:
+        if path in _initialized:
+            return
+        with connect(path) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            imported = conn.execute("SELECT 1 FROM store_meta WHERE key = 'csv_imported'").fetchone()
+        if not imported:
+            import_csv(path, events_file, reference_files)
+        _initialized.add(path)
+
+def import_csv(path, events_file, reference_files):
+    """One-time import of the CSV data files, keeping event ids"""
+    events_df = pd.read_csv(events_file)
+    with connect(path) as conn:
+        columns = ['id'] + [col for col in EVENT_COLUMNS if col in events_df.columns]
+        conn.executemany(
+            f"INSERT OR REPLACE INTO events ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            events_df[columns].astype(object).where(events_df[columns].notna(), None).itertuples(index=False)
+        )
+        for table, file_path in reference_files.items():
+            reference_df = pd.read_csv(file_path)
+            conn.executemany(
+                f'INSERT OR IGNORE INTO {table} (value, order_index) VALUES (?, ?)',
+                reference_df[['value', 'order_index']].itertuples(index=False)
+            )
+        conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('csv_imported', '1')")
+        _bump_version(conn)
+
+def data_version(path):
+    """Counter incremented by every write to the events table"""
+    with connect(path) as conn:
+        return conn.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()[0]
+
+def load_reference(path, table):
+    with connect(path) as conn:
+        return pd.read_sql_query(f'SELECT value, order_index FROM {table} ORDER BY order_index', conn)
+
+def distinct_values(path, column):
+    """Sorted distinct values of an indexed events column"""
+    with connect(path) as conn:
+        rows = conn.execute(
+            f'SELECT DISTINCT {column} FROM events WHERE {column} IS NOT NULL ORDER BY {column}'
+        ).fetchall()
+    return [row[0] for row in rows]
+
+def load_events(path, filters=None):
+    """Load events matching `filters`, a mapping of column to accepted values.
+
+    Columns mapped to an empty list are not filtered on.
+    """
+    filters = {col: list(values) for col, values in (filters or {}).items() if len(values)}
+    unknown = set(filters) - set(FILTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Cannot filter on: {', '.join(sorted(unknown))}")
+    where = ' AND '.join(f"{col} IN ({', '.join('?' * len(values))})" for col, values in filters.items())
+    params = [value for values in filters.values() for value in values]
+    query = f"SELECT * FROM events{' WHERE ' + where if where else ''} ORDER BY id"
+    with connect(path) as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+def get_event(path, event_id):
+    with connect(path) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('SELECT * FROM events WHERE id = ?', (event_id,)).fetchone()
+    return dict(row) if row else None
+
+def insert_event(path, event_data):
+    """Insert an event and return its autoincrement id"""
+    columns = [col for col in EVENT_COLUMNS if col in event_data]
+    with connect(path) as conn:
+        cursor = conn.execute(
+            f"INSERT INTO events ({', '.join(columns)}) VALUES ({', '.join(':' + col for col in columns)})",
+            event_data
+        )
+        _bump_version(conn)
+        return cursor.lastrowid
+
+def update_events(path, rows):
+    """Update events in place; each row carries its `id` and the changed columns"""
+    with connect(path) as conn:
+        for row in rows:
+            columns = [col for col in EVENT_COLUMNS if col in row]
+            conn.execute(
+                f"UPDATE events SET {', '.join(f'{col} = :{col}' for col in columns)} WHERE id = :id",
+                row
+            )
+        _bump_version(conn)
+
+def delete_event(path, event_id):
+    with connect(path) as conn:
+        conn.execute('DELETE FROM events WHERE id = ?', (event_id,))
+        _bump_version(conn)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Light-route tail latency of the Flask server while heavy routes are saturated.
+
+Seeds a throwaway SQLite database or CSV directory with --rows events and
+serves backend-python's app with admission control installed. --heavy
+clients keep exporting the full event table (exports are neither coalesced
+nor cached, so every request does the full read) while --light clients
+alternate POST /entries and GET /dropdowns. The same load runs once with admission
+control switched off and once with it on. The report gives light-route
+latency percentiles, and how many heavy requests completed or were turned
+away (429/503).
+
+    PYTHONPATH=backend-node python benchmarks/admission_latency.py --storage sqlite
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from harness import light_client, load_server, percentiles, seed_dropdowns, seed_events, serve
+
+def heavy_client(port, stop, outcomes, client_id):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    while not stop.is_set():
+        conn.request('GET', '/export/events?format=ndjson', headers={'X-Client-Id': f'heavy-{client_id}'})
+        response = conn.getresponse()
+        response.read()
+        outcomes.append(response.status)
+        if response.status in (429, 503):
+            # Back off as told, capped so the phase keeps its pressure
+            time.sleep(min(float(response.headers.get('Retry-After', 1)), 0.2))
+    conn.close()
+
+def run_phase(port, light, heavy, duration):
+    stop = threading.Event()
+    latencies = []
+    outcomes = []
+    threads = [threading.Thread(target=light_client, args=(port, stop, latencies, f'light-{i}'))
+               for i in range(light)]
+    threads += [threading.Thread(target=heavy_client, args=(port, stop, outcomes, i)) for i in range(heavy)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {
+        'light': percentiles(latencies),
+        'heavy_completed': sum(status == 200 for status in outcomes),
+        'heavy_rejected': sum(status in (429, 503) for status in outcomes)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--storage', choices=['sqlite', 'csv'], default='sqlite')
+    parser.add_argument('--rows', type=int, default=20000, help='events seeded before measuring (default: 20000)')
+    parser.add_argument('--light', type=int, default=4, help='light-route clients (default: 4)')
+    parser.add_argument('--heavy', type=int, default=16, help='heavy-route clients (default: 16)')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per phase (default: 10)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = load_server(args.storage, Path(tmp), ADMISSION_CONTROL='true')
+        seed_dropdowns(server)
+        seed_events(server, args.rows)
+        try:
+            with serve(server.app) as port:
+                server.admission.enabled = False
+                uncontrolled = run_phase(port, args.light, args.heavy, args.duration)
+                server.admission.enabled = True
+                controlled = run_phase(port, args.light, args.heavy, args.duration)
+        finally:
+            server.shutdown()
+
+    results = {
+        'storage': args.storage,
+        'rows': args.rows,
+        'light_clients': args.light,
+        'heavy_clients': args.heavy,
+        'without_admission': uncontrolled,
+        'with_admission': controlled
+    }
+    for phase in ['without_admission', 'with_admission']:
+        light = ', '.join(f'{key}={value}' for key, value in results[phase]['light'].items())
+        print(f"{phase}: light {light}; heavy completed={results[phase]['heavy_completed']} "
+              f"rejected={results[phase]['heavy_rejected']}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""API latency of the Flask server while online backups run.
+
+Seeds a throwaway SQLite database or CSV directory, serves backend-python's
+app on a local port and keeps --clients connections busy with light calls
+(POST /entries and GET /dropdowns, alternating). The same load runs twice,
+for --duration seconds each: once without backups, once while snapshots
+are taken back to back. The report gives per-phase latency percentiles and
+the snapshot durations.
+
+    PYTHONPATH=backend-node python benchmarks/backup_latency.py --storage sqlite
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from harness import light_client, load_server, percentiles, seed_dropdowns, seed_events, serve
+
+def run_phase(port, clients, duration, backup=None):
+    """Run the client load for `duration` seconds, optionally with back-to-back backups"""
+    stop = threading.Event()
+    latencies = []
+    threads = [threading.Thread(target=light_client, args=(port, stop, latencies)) for _ in range(clients)]
+    backup_times = []
+
+    def backups():
+        while not stop.is_set():
+            started = time.perf_counter()
+            backup()
+            backup_times.append(time.perf_counter() - started)
+
+    if backup:
+        threads.append(threading.Thread(target=backups))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    result = percentiles(latencies)
+    if backup_times:
+        result['backups'] = len(backup_times)
+        result['backup_median_s'] = round(statistics.median(backup_times), 3)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--storage', choices=['sqlite', 'csv'], default='sqlite')
+    parser.add_argument('--rows', type=int, default=200000, help='events seeded before measuring (default: 200000)')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent client connections (default: 8)')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per phase (default: 10)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = load_server(args.storage, Path(tmp))
+        import backup
+
+        seed_dropdowns(server)
+        seed_events(server, args.rows)
+        try:
+            with serve(server.app) as port:
+                results = {
+                    'storage': args.storage,
+                    'rows': args.rows,
+                    'clients': args.clients,
+                    'baseline': run_phase(port, args.clients, args.duration),
+                    'during_backup': run_phase(port, args.clients, args.duration, backup.create_backup)
+                }
+        finally:
+            server.shutdown()
+
+    for phase in ['baseline', 'during_backup']:
+        print(f"{phase}: " + ', '.join(f'{key}={value}' for key, value in results[phase].items()), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Helpers shared by the benchmarks that drive backend-python over HTTP."""
+
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+EVENT = {
+    'event_name': 'Benchmark event',
+    'event_type': 'Conference',
+    'origin_country': 'USA',
+    'main_impact_country': 'UK',
+    'relevant_exchange': 'NYSE',
+    'month': 'January',
+    'year': '2024',
+    'description': 'Seeded to give the server something to read. ' * 4
+}
+
+ENTRY = {
+    'date': '2024-01-15',
+    'month': 'January',
+    'origin_country': 'USA',
+    'main_impact_country': 'UK',
+    'relevant_exchange': 'NYSE',
+    'event_type': 'Conference',
+    'who_input': 'benchmark',
+    'when_input': '2024-01-15T10:00:00',
+    'details': 'Posted while measuring'
+}
+
+def percentiles(samples):
+    """Request count and latency percentiles in milliseconds"""
+    if not samples:
+        return {'requests': 0}
+    ordered = sorted(samples)
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        'requests': len(ordered),
+        'p50_ms': round(at(0.50), 2),
+        'p95_ms': round(at(0.95), 2),
+        'p99_ms': round(at(0.99), 2),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
+
+def load_server(storage, data_dir, **env):
+    """Import backend-python's server against a fresh data directory.
+
+    `env` sets extra environment variables before the config is read.
+    """
+    os.environ.update({
+        'STORAGE_TYPE': storage,
+        'SQLITE_FILE': str(data_dir / 'events.db'),
+        'BACKUP_DIR': str(data_dir / 'backups'),
+        'BACKUP_INTERVAL': '0',
+        **env
+    })
+    sys.path.insert(0, str(ROOT / 'backend-python'))
+    from config import Config
+    for key in Config.CSV:
+        Config.CSV[key] = str(data_dir / os.path.basename(Config.CSV[key]))
+    import server
+    return server
+
+def seed_dropdowns(server):
+    """Add the dropdown values EVENT and ENTRY use, so their writes validate"""
+    client = server.app.test_client()
+    for key in ['origin_country', 'main_impact_country', 'relevant_exchange', 'event_type']:
+        client.post(f'/dropdowns/{key}', json={'value': ENTRY[key]}).close()
+
+def seed_events(server, rows, batch=5000):
+    created_at = datetime.utcnow()
+    for start in range(0, rows, batch):
+        server.insert_events([{**EVENT, 'created_at': created_at}] * min(batch, rows - start))
+
+@contextmanager
+def serve(app):
+    """Serve a WSGI app on a free local port; yields the port"""
+    from werkzeug.serving import make_server
+    # Per-request access logs would dominate the measurement
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    http_server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    try:
+        yield http_server.port
+    finally:
+        http_server.shutdown()
+
+def light_client(port, stop, latencies, client_id='light'):
+    """Alternate POST /entries and GET /dropdowns until `stop` is set"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    body = json.dumps(ENTRY)
+    headers = {'Content-Type': 'application/json', 'X-Client-Id': client_id}
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        if i % 2:
+            conn.request('GET', '/dropdowns', headers=headers)
+        else:
+            conn.request('POST', '/entries', body, headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        i += 1
+    conn.close()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark for the Flask server and the Streamlit dashboards.
+
+Each entry point is started in a fresh interpreter, so module imports are
+measured cold:
+
+- flask-server:      time to `import server`, and to the first response
+                     from GET / through the Flask test client
+- streamlit:         time to import the Streamlit test harness, and to the
+                     first complete script run of backend-streamlit/app.py
+- streamlit-service: the same for backend-streamlit-service/app.py, which
+                     needs BACKEND_URL to point at a running backend
+
+Results are the median of --runs runs. With --baseline, the run fails when
+a metric is more than --threshold (relative) slower than the baseline, or
+when the baseline file does not exist; --update-baseline records the
+current results instead. Timings depend on the machine, so no baseline is
+committed: record one where the check runs, then check against it:
+
+    python benchmarks/startup.py --baseline startup_baseline.json --update-baseline
+    python benchmarks/startup.py --baseline startup_baseline.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FLASK_PROBE = """
+import json, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+response = server.app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import_s': imported - start,
+    'first_response_s': time.perf_counter() - start
+}))
+"""
+
+STREAMLIT_PROBE = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file('app.py', default_timeout=120).run()
+assert not at.exception, at.exception
+print(json.dumps({
+    'import_s': imported - start,
+    'first_paint_s': time.perf_counter() - start
+}))
+"""
+
+ENTRY_POINTS = {
+    'flask-server': ('backend-python', FLASK_PROBE),
+    'streamlit': ('backend-streamlit', STREAMLIT_PROBE),
+    'streamlit-service': ('backend-streamlit-service', STREAMLIT_PROBE)
+}
+
+def run_probe(name):
+    """Run one entry point's probe in a fresh interpreter and return its timings"""
+    directory, probe = ENTRY_POINTS[name]
+    cwd = ROOT / directory
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(cwd), env.get('PYTHONPATH')]))
+    result = subprocess.run(
+        [sys.executable, '-c', probe],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} failed to start:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure(name, runs):
+    samples = [run_probe(name) for _ in range(runs)]
+    return {metric: statistics.median(sample[metric] for sample in samples) for metric in samples[0]}
+
+def compare(results, baseline, threshold):
+    """List of (entry, metric, baseline, current) for metrics that regressed"""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            expected = baseline.get(name, {}).get(metric)
+            if expected is not None and value > expected * (1 + threshold):
+                regressions.append((name, metric, expected, value))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(ENTRY_POINTS), default=None,
+                        help='entry points to measure (default: all)')
+    parser.add_argument('--runs', type=int, default=5, help='runs per entry point (default: 5)')
+    parser.add_argument('--baseline', type=Path, help='JSON file with baseline timings')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative slowdown against the baseline (default: 0.25)')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results to --baseline')
+    args = parser.parse_args()
+    if args.baseline and not args.update_baseline and not args.baseline.exists():
+        parser.error(f'baseline {args.baseline} does not exist; record it with --update-baseline')
+
+    results = {}
+    for name in args.only or ENTRY_POINTS:
+        results[name] = measure(name, args.runs)
+        print(f"{name}: " + ', '.join(f"{metric}={value * 1000:.0f}ms" for metric, value in results[name].items()),
+              file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2) + '\n')
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+    for name, metric, expected, value in regressions:
+        print(f"REGRESSION {name} {metric}: {value * 1000:.0f}ms vs baseline {expected * 1000:.0f}ms",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Storage-layer microbenchmarks of backend-python at several dataset sizes.
+
+For each --storage and each --sizes value, a throwaway data directory is
+seeded with that many entries and events by backend-python's seed.py
+(skewed countries and event types), then each operation is timed through
+the Flask test client, so HTTP overhead is left out, with the result cache
+off so every read reaches storage:
+
+    csv_read_all / csv_write_all   whole-file read and rewrite (CSV only)
+    insert, update, delete         POST, PUT and DELETE /entries
+    list_entries_month             GET /entries?from=&to= for a random month
+    list_events_year               GET /events?year= for a random year
+    export_events_country          GET /export/events filtered by country
+    dropdowns                      GET /dropdowns
+
+An operation repeats --repeat times or until it has used --budget seconds.
+Each size runs in its own process so nothing is cached across sizes. The
+JSON report (stdout, or --output) has latency percentiles per operation.
+
+    PYTHONPATH=backend-node python benchmarks/storage_ops.py --storage csv sqlite --sizes 10000 100000
+"""
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+from harness import ENTRY, load_server, percentiles
+
+def timed(op, repeat, budget):
+    """Run `op(i)` up to `repeat` times, stopping once `budget` seconds are used"""
+    samples = []
+    deadline = time.perf_counter() + budget
+    for i in range(repeat):
+        started = time.perf_counter()
+        op(i)
+        samples.append(time.perf_counter() - started)
+        if time.perf_counter() > deadline:
+            break
+    result = percentiles(samples)
+    result['mean_ms'] = round(sum(samples) / len(samples) * 1000, 2)
+    return result
+
+def check(response):
+    body = response.get_data()
+    response.close()
+    if response.status_code != 200:
+        raise RuntimeError(f'{response.status_code}: {body[:200]}')
+
+def run_size(storage, rows, repeat, budget):
+    """Seed `rows` entries and events, then time each operation; runs in a worker process"""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = load_server(storage, Path(tmp), RESULT_CACHE_MB='0')
+        from config import Config
+        import csv_store
+        import seed
+
+        seeded = seed.seed(server, rows, rows, seed=rows)
+        first_year = date.today().year - 4
+        client = server.app.test_client()
+        rng = random.Random(0)
+        countries = seed.DEFAULT_DROPDOWNS['countries']
+        # Distinct ids, so every delete removes a row
+        ids = iter(rng.sample(range(rows), min(rows, repeat * 2)))
+        first_id = seeded['entries']['first_id']
+
+        def month_range(i):
+            year, month = rng.randint(first_year, first_year + 4), rng.randint(1, 12)
+            end = date(year + month // 12, month % 12 + 1, 1).toordinal() - 1
+            return f'/entries?from={date(year, month, 1)}&to={date.fromordinal(end)}'
+
+        ops = {}
+        if storage == 'csv':
+            table = csv_store.CsvTable(Config.CSV['data_path'], csv_store.SCHEMAS['data_path'])
+            ops['csv_read_all'] = lambda i: table.read_all()
+            ops['csv_write_all'] = lambda i: table.write_all(table.read_all())
+        ops.update({
+            'insert': lambda i: check(client.post('/entries', json=ENTRY)),
+            'update': lambda i: check(client.put(f'/entries/{first_id + next(ids)}', json={**ENTRY, 'details': f'edit {i}'})),
+            'delete': lambda i: check(client.delete(f'/entries/{first_id + next(ids)}')),
+            'list_entries_month': lambda i: check(client.get(month_range(i))),
+            'list_events_year': lambda i: check(client.get(f'/events?year={rng.randint(first_year, first_year + 4)}')),
+            'export_events_country': lambda i: check(client.get(
+                f'/export/events?format=ndjson&origin_country={rng.choice(countries)}')),
+            'dropdowns': lambda i: check(client.get('/dropdowns'))
+        })
+
+        results = {'storage': storage, 'rows': rows, 'seed': seeded, 'operations': {}}
+        try:
+            for name, op in ops.items():
+                print(f'{storage} {rows}: {name}', file=sys.stderr)
+                results['operations'][name] = timed(op, repeat, budget)
+        finally:
+            server.shutdown()
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--storage', nargs='+', choices=['csv', 'sqlite'], default=['csv', 'sqlite'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000],
+                        help='entries and events seeded per run (default: 10000 100000 1000000)')
+    parser.add_argument('--repeat', type=int, default=20, help='samples per operation (default: 20)')
+    parser.add_argument('--budget', type=float, default=10, help='seconds per operation at most (default: 10)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--worker', nargs=2, metavar=('STORAGE', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        storage, rows = args.worker
+        print(json.dumps(run_size(storage, int(rows), args.repeat, args.budget)))
+        return 0
+
+    runs = []
+    for storage in args.storage:
+        for rows in args.sizes:
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', storage, str(rows),
+                 '--repeat', str(args.repeat), '--budget', str(args.budget)],
+                check=True, stdout=subprocess.PIPE, text=True
+            ).stdout
+            run = json.loads(output)
+            runs.append(run)
+            for name, result in run['operations'].items():
+                print(f"{storage} {rows}: {name} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                      f"({result['requests']} samples)", file=sys.stderr)
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'budget_s': args.budget,
+        'runs': runs
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())